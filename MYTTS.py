@@ -14,6 +14,14 @@ import hmac
 import hashlib
 import random
 import string
+
+# 默认音色和参数（语音缓存按这些参数区分）
+TENCENT_VOICE_TYPE = 501006
+TENCENT_SPEED = 0
+TENCENT_VOLUME = 10
+ALI_VOICE = 'Kenny'
+EDGE_VOICE = 'zh-CN-XiaoxiaoNeural'
+
 class TencentTTS:
     def __init__(self, secret_id, secret_key, region="ap-guangzhou", voice_type=1001):
         """
@@ -111,19 +119,20 @@ class TencentTTS:
             print(f"发生错误: {str(e)}")
             return False 
 
-def tencentTTS(text,output_path):
+def tencentTTS(text,output_path,voice_type=TENCENT_VOICE_TYPE,speed=TENCENT_SPEED,volume=TENCENT_VOLUME):
     # 初始化TTS服务，设置音色
     tts = TencentTTS(
         secret_id="",
         secret_key="",
-        voice_type=501006 # 设置音色，1001是智瑜
+        voice_type=voice_type # 设置音色，1001是智瑜
     )
 
     # 转换文本为语音
     success = tts.text_to_speech(
         text=text,
         output_path=output_path,
-        volume=10
+        speed=speed,
+        volume=volume
     )
     return success
 
@@ -181,7 +190,7 @@ class TestTts:
         return tts
 
 
-def aliTTS(text,voice='Kenny',output_path='./out.wav',url="wss://nls-gateway-cn-shanghai.aliyuncs.com/ws/v1"):
+def aliTTS(text,voice=ALI_VOICE,output_path='./out.wav',url="wss://nls-gateway-cn-shanghai.aliyuncs.com/ws/v1"):
     nls.enableTrace(True)
     t = TestTts(output_path,getAlitoken(),'XF4owsb11DeS6VNf',voice,url)
     t.start(text)
@@ -1,6 +1,7 @@
 import subprocess
 import os
 import tempfile
+from audio_engine import DEFAULT_SAMPLE_RATE
 startupinfo = subprocess.STARTUPINFO()
 startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
 def add_bgm_ffmpeg(
@@ -71,3 +72,42 @@ def add_bgm_ffmpeg(
     ]
     subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     os.remove(temp_music_path)
+
+def mux_narration_with_bgm(
+    video_path: str,
+    narration_path: str,
+    music_path: str,
+    output_path: str,
+    music_volume: float = 0.5,
+    ffmpeg_path: str = "./ffmpeg/bin/ffmpeg.exe"
+):
+    """
+    一次ffmpeg调用合成最终视频：画面直接复制，无损旁白与循环的背景音乐混音后只编码一次AAC
+
+    混音方式与 add_bgm_ffmpeg 相同（amix，以旁白长度为准），但不再先生成无背景音乐的中间视频，
+    旁白也不会经过MP3和AAC两次有损编码。
+    """
+    for path in (video_path, narration_path, music_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"未找到文件：{path}")
+
+    cmd = [
+        ffmpeg_path, "-y",
+        "-i", video_path,
+        "-i", narration_path,
+        "-stream_loop", "-1", "-i", music_path,
+        "-filter_complex",
+        # 旁白可能是单声道（腾讯云返回16kHz单声道），先升为立体声再混音，否则amix会把背景音乐一起混成单声道
+        f"[1:a]aformat=channel_layouts=stereo[voice];[2:a]volume={music_volume}[bgm];"
+        f"[voice][bgm]amix=inputs=2:duration=first:dropout_transition=2[aout]",
+        "-map", "0:v",
+        "-map", "[aout]",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        # 旁白保持语音服务的原始采样率（腾讯云为16kHz），输出统一为44.1kHz，避免背景音乐被一起降采样
+        "-ar", str(DEFAULT_SAMPLE_RATE),
+        "-ac", "2",
+        "-shortest",
+        output_path
+    ]
+    subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
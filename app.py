@@ -2,12 +2,22 @@ from get_video import *
 from flask import Flask, request, jsonify
 import threading
 from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import uuid
 import shutil
 import logging
 import traceback
-from add_bgm import add_bgm_ffmpeg
+from add_bgm import add_bgm_ffmpeg, mux_narration_with_bgm
 from douyin_downloader import download_video_method
+from ffmpeg_render import render_with_ffmpeg, probe_frame_size
+from ass_subtitle import render_with_ass, write_ass_file
+from frame_cache import DEFAULT_MAX_BYTES, build_frame_cache, close_frame_cache, is_still_image
+from keyframe_index import load_keyframe_index, remove_keyframe_index
+from background_ingest import NORMALIZED_CACHE_DIR, DEFAULT_NORMALIZED_CACHE_BYTES, file_digest, normalize_background, prune_normalized_cache
+from tts_engine import synthesize_all
+from audio_engine import AAC_FRAME_SAMPLES, build_narration, timeline_drift
+from tts_cache import TTS_CACHE_DIR, DEFAULT_TTS_CACHE_BYTES, prune_tts_cache, tts_cache_stats
+from segment_cache import SEGMENT_CACHE_DIR, DEFAULT_SEGMENT_CACHE_BYTES, segment_key, has_segment, prune_segment_cache
 
 # 配置日志
 logging.basicConfig(
@@ -26,58 +36,6 @@ progress_lock = Lock()  # 进度锁
 startupinfo = subprocess.STARTUPINFO()
 startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
 
-# 生成视频的函数
-def generate_video_method(
-    s,
-    tmls,
-    t,
-    stage_weights,
-    task_id,
-    sentences,
-    backGround_image_path="./background.jpg",
-    ffmpeg_path="./ffmpeg/bin/ffmpeg.exe",
-    font_path_chinese=r"C:\\Windows\\Fonts\\simsun.ttc",
-    chinese_text_size=10,
-    chinese_text_color=(0,0,0),
-    chinese_text_posotion=1.75,
-    line_spacing=1.5
-    ):
-    try:
-        with progress_lock:
-            progress_dict[task_id] += stage_weights[0]
-        
-        output_paths = []
-        lens = len(sentences)
-        for idx, sentence in enumerate(sentences):
-            output_path = os.path.abspath(f'./cache/{task_id}/output_{t}_{idx}.mp4')
-            output_paths.append(output_path)
-            conf = {
-                "chinese_text_size": chinese_text_size,
-                "chinese_text_color": chinese_text_color,
-                "chinese_text_posotion": chinese_text_posotion,
-                "line_spacing": line_spacing,
-                "input_video_path": backGround_image_path,
-                "chinese_text": sentence,
-                "output_video_path": output_path,
-                "font_path_chinese": font_path_chinese,
-                "start_time": tmls[idx+s][0],
-                "end_time": tmls[idx+s][1]
-            }
-            create_video(**conf)
-            with progress_lock:
-                progress_dict[task_id] += (1/lens)*stage_weights[1]
-        
-        # 合并视频片段
-        merge_VA(output_paths, f'./cache/{task_id}/finalPicture_{t}.mp4', ffmpeg_path, f'./cache/{task_id}/file_{t}.txt')
-        with progress_lock:
-            progress_dict[task_id] += stage_weights[2]
-    except Exception as e:
-        error_msg = f"视频生成阶段出错 (线程 {t}): {str(e)}"
-        logger.error(error_msg)
-        with progress_lock:
-            error_dict[task_id] = error_msg
-        raise
-
 def split_integer(num, n):
     """将整数num均匀分成n份"""
     base, remainder = divmod(num, n)
@@ -175,12 +133,9 @@ def upload_file():
         
         # 分配权重
         x = split_integer(lens, thnum)
-        stage_weights = [5, 50, 10]
-        stage_weights = [w/thnum for w in stage_weights]
         
         # 初始化路径列表
         audio_paths = []
-        video_paths = []
         
         # 创建缓存目录
         cache_dir = f'./cache/{task_id}'
@@ -280,39 +235,100 @@ def upload_file():
                     progress_dict[task_id] = -1  # 表示任务出错
                 raise
         
+        # 可选的背景预处理：转码为恒定帧率、短GOP的中间文件，按内容哈希缓存，
+        # 缓存超过 normalized_cache_max_bytes 时删除最久未使用的中间文件
+        def ingest_background(movie_path):
+            if not data.get('normalize_background'):
+                return movie_path
+            try:
+                normalized_path = normalize_background(
+                    movie_path,
+                    data.get('ffmpeg_path'),
+                    normalize_options=data.get('normalize_options')
+                )
+            except Exception as e:
+                logger.warning(f"背景视频转码失败，使用原视频: {str(e)}")
+                return movie_path
+            prune_normalized_cache(
+                NORMALIZED_CACHE_DIR,
+                int(data.get('normalized_cache_max_bytes', DEFAULT_NORMALIZED_CACHE_BYTES)),
+                keep=normalized_path
+            )
+            return normalized_path
+        
         # 生成语音并获取时长
+        # 各句并发请求语音服务（tts_concurrency 覆盖默认并发数），完成后按原顺序计算时间线；
+        # tts_cache 为真时（默认）相同文本和音色参数的语音直接从 ./tts_cache 复制
+        use_tts_cache = data.get('tts_cache', True)
+        # audio_engine 为 'numpy'（默认）时每句语音在进程内处理为WAV，最后在内存中拼接、只编码一次；
+        # 为 'ffmpeg' 时每句编码为MP3后用concat合并
+        use_pcm_audio = data.get('audio_engine', 'numpy') == 'numpy'
+        audio_ext = 'wav' if use_pcm_audio else 'mp3'
         def generate_audio():
-            currentTime = 0
-            tmls = []
-            try:
-                for idx, sentence in enumerate(sentences):
-                    # 确定该句子对应的线程索引
-                    t = next(j-1 for j in range(len(x)) if idx < x[j])
+            # 任务内重复的句子只合成一次语音：句子 -> 首次出现的序号
+            first_index = {}
+            repeats = {}
+            for idx, sentence in enumerate(sentences):
+                first_index.setdefault(sentence, idx)
+                repeats[sentence] = repeats.get(sentence, 0) + 1
+            unique = sorted(first_index.values())
+            
+            def synthesize(idx):
+                sentence = sentences[idx]
+                # 确定该句子对应的线程索引
+                t = next(j-1 for j in range(len(x)) if idx < x[j])
+                audio_path = os.path.abspath(f'{cache_dir}/audio_{t}_{idx}.{audio_ext}')
+                try:
+                    logger.info(f"开始生成语音: {sentence[:20]}...")
+                    # 生成语音
+                    duration = generate_audio_useTencentAPI(
+                        sentence,
+                        audio_path,
+                        data.get('ffmpeg_path'),
+                        task_id,
+                        voice_type=int(data.get('tts_voice_type', TENCENT_VOICE_TYPE)),
+                        speed=float(data.get('tts_speed', TENCENT_SPEED)),
+                        volume=float(data.get('tts_volume', TENCENT_VOLUME)),
+                        tts_cache_dir=TTS_CACHE_DIR if use_tts_cache else None
+                    )
                     
-                    audio_path = os.path.abspath(f'{cache_dir}/audio_{t}_{idx}.mp3')
+                    if not os.path.exists(audio_path):
+                        raise ValueError(f"生成的语音文件不存在: {audio_path}")
+                except Exception as e:
+                    error_msg = f"语音生成失败 ({idx+1}/{len(sentences)}): {str(e)}"
+                    logger.error(error_msg)
+                    with progress_lock:
+                        error_dict[task_id] = error_msg
+                    raise
+                return audio_path, duration
+            
+            def on_synthesized(k, result):
+                # 重复的句子随首次出现的句子一起计入进度
+                with progress_lock:
+                    progress_dict[task_id] += 25*repeats[sentences[unique[k]]]/len(sentences)
+            
+            try:
+                results = synthesize_all(
+                    unique,
+                    synthesize,
+                    provider='tencent',
+                    concurrency=data.get('tts_concurrency'),
+                    progress_callback=on_synthesized
+                )
+                synthesized = {sentences[idx]: result for idx, result in zip(unique, results)}
+                
+                # 按原顺序记录语音文件和时间戳
+                currentTime = 0
+                tmls = []
+                for sentence in sentences:
+                    audio_path, duration = synthesized[sentence]
                     audio_paths.append(audio_path)
-                    
-                    try:
-                        logger.info(f"开始生成语音: {sentence[:20]}...")
-                        # 生成语音
-                        duration = generate_audio_useTencentAPI(sentence, audio_path, data.get('ffmpeg_path'), task_id)
-                        
-                        if not os.path.exists(audio_path):
-                            raise ValueError(f"生成的语音文件不存在: {audio_path}")
-                        
-                        # 记录时间戳
-                        tmls.append([currentTime, currentTime+duration])
-                        currentTime += duration
-                        
-                        # 更新进度
-                        with progress_lock:
-                            progress_dict[task_id] += 25/len(sentences)
-                    except Exception as e:
-                        error_msg = f"语音生成失败 ({idx+1}/{len(sentences)}): {str(e)}"
-                        logger.error(error_msg)
-                        with progress_lock:
-                            error_dict[task_id] = error_msg
-                        raise
+                    tmls.append([currentTime, currentTime+duration])
+                    currentTime += duration
+                if len(unique) < len(sentences):
+                    logger.info(f"{len(sentences) - len(unique)} 句重复句子复用已合成的语音")
+                if use_tts_cache:
+                    prune_tts_cache(TTS_CACHE_DIR, int(data.get('tts_cache_max_bytes', DEFAULT_TTS_CACHE_BYTES)))
                 return tmls
             except Exception as e:
                 with progress_lock:
@@ -320,6 +336,261 @@ def upload_file():
                         error_dict[task_id] = f"语音处理过程出错: {str(e)}"
                 raise
         
+        # 把各句语音拼接成无损旁白（finalAudio.wav），核对字幕时间线与旁白的实际位置
+        def assemble_narration(tmls):
+            timeline, rate = build_narration(audio_paths, f'{cache_dir}/finalAudio.wav', data.get('ffmpeg_path'))
+            drift = timeline_drift(tmls, timeline, rate)
+            if drift > AAC_FRAME_SAMPLES:
+                logger.warning(f"字幕时间线与旁白偏差 {drift} 个采样，超过一个音频帧，改用旁白的实际位置")
+                return timeline
+            logger.info(f"字幕时间线与旁白偏差 {drift} 个采样")
+            return tmls
+        
+        # 把背景视频解码到缓存，frame_cache_max_bytes 为0时关闭，超过上限时返回None（流式解码）
+        def prepare_frame_cache(movie_path):
+            max_bytes = int(data.get('frame_cache_max_bytes', DEFAULT_MAX_BYTES))
+            if max_bytes <= 0:
+                return None
+            try:
+                return build_frame_cache(movie_path, f'{cache_dir}/frame_cache', max_bytes)
+            except Exception as e:
+                logger.warning(f"背景视频解码缓存失败，使用流式解码: {str(e)}")
+                return None
+        
+        # 逐句生成视频片段并合并，executor 为 'process' 时使用进程池（绕开GIL），否则使用线程池
+        def generate_video_segments(tmls, movie_path):
+            render_options = {
+                "chinese_text_size": int(data.get('chinese_text_size')),
+                "chinese_text_color": tuple(data.get('chinese_text_color')),
+                "chinese_text_posotion": float(data.get('chinese_text_position')),
+                "line_spacing": float(data.get('line_spacing')),
+                "blur_mode": data.get('blur_mode', 'quality'),
+                "compose_mode": data.get('compose_mode', 'numpy'),
+                "encoder": data.get('encoder', 'ffmpeg'),
+                "ffmpeg_path": data.get('ffmpeg_path'),
+                "encoder_options": data.get('encoder_options'),
+                "pipeline_workers": int(data.get('pipeline_workers', 1)),
+                "batch_memory": int(float(data.get('batch_memory_mb', DEFAULT_BATCH_MEMORY / 1024 ** 2)) * 1024 ** 2),
+                "input_video_path": movie_path,
+                "font_path_chinese": data.get('font_path_chinese'),
+            }
+            use_process = data.get('executor', 'thread') == 'process'
+            if use_process:
+                workers = int(data.get('process_workers') or os.cpu_count() or 1)
+            else:
+                workers = thnum
+            
+            # 静态背景每句只合成一帧，不需要解码缓存，也不必拆分长句
+            still_image = is_still_image(movie_path)
+            render_options["still_image"] = still_image
+            
+            # 按帧数划分任务，长句拆分到帧边界
+            width, height, fps, background_frames = probe_video(movie_path)
+            if still_image:
+                items = plan_segments(tmls, fps, 1, chunks_per_worker=1)
+            else:
+                items = plan_segments(tmls, fps, workers)
+            if not items:
+                raise Exception("没有需要渲染的视频帧")
+            
+            # 相同的字幕、样式和背景窗口只渲染一次：任务内重复的片段直接复制，
+            # segment_cache 为真时（默认）还会跨任务复用 ./segment_cache 中的片段
+            use_segment_cache = data.get('segment_cache', True)
+            # 任务内去重时背景相同，只有跨任务复用才需要背景的内容摘要（同一文件的摘要会记录下来，不重复计算）
+            background_digest = file_digest(movie_path) if use_segment_cache else None
+            output_paths = []
+            confs = []
+            primary = {}
+            duplicates = []
+            for idx, start_time, end_time, frames in items:
+                output_path = os.path.abspath(f'{cache_dir}/output_{len(confs)}.mp4')
+                output_paths.append(output_path)
+                conf = dict(
+                    render_options,
+                    chinese_text=sentences[idx],
+                    output_video_path=output_path,
+                    start_time=start_time,
+                    end_time=end_time
+                )
+                key = segment_key(conf, background_digest, time_to_frame(start_time, fps) % max(1, background_frames), frames, still_image)
+                if key in primary:
+                    duplicates.append((len(confs), primary[key]))
+                else:
+                    primary[key] = len(confs)
+                    if use_segment_cache:
+                        conf["segment_cache_dir"] = SEGMENT_CACHE_DIR
+                        conf["segment_key"] = key
+                confs.append(conf)
+            total_frames = sum(frames for _, _, _, frames in items)
+            render_keys = [key for key in primary if not (use_segment_cache and has_segment(SEGMENT_CACHE_DIR, key))]
+            logger.info(f"共 {len(confs)} 个片段，任务内重复 {len(duplicates)} 个，缓存命中 {len(primary) - len(render_keys)} 个")
+            
+            # 时间线比背景视频长、背景需要循环播放时，各片段会重复解码相同的帧，
+            # 此时先把背景解码一次，各工作线程/进程共享内存映射的解码缓存；不循环时各片段的帧互不重叠，直接流式解码
+            frame_cache_path = None
+            if render_keys and not still_image and background_frames > 1 and time_to_frame(tmls[-1][1], fps) > background_frames:
+                frame_cache_path = prepare_frame_cache(movie_path)
+            
+            # 流式解码时用关键帧索引得到准确帧数，各片段从开始帧之前最近的关键帧解码，索引保存在背景视频旁，下次直接读取
+            keyframe_index = None
+            if render_keys and not still_image and not frame_cache_path:
+                keyframe_index = load_keyframe_index(movie_path, data.get('ffmpeg_path'))
+            for conf in confs:
+                conf["frame_cache_path"] = frame_cache_path
+                conf["keyframe_index"] = keyframe_index
+            
+            # 全部字幕中的字符只栅格化一次，各线程共用（进程池在工作进程初始化时建立）
+            if render_keys and not use_process:
+                prepare_glyph_atlas(sentences, render_options['font_path_chinese'], width, height, render_options['chinese_text_size'])
+            
+            if use_process:
+                # 工作进程启动时预先加载字体和字形集合
+                font_size = min(width, height) // render_options['chinese_text_size']
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=init_render_worker,
+                    initargs=(render_options['font_path_chinese'], font_size, ''.join(sentences))
+                )
+            else:
+                executor = ThreadPoolExecutor(max_workers=workers)
+            logger.info(f"使用 {workers} 个{'进程' if use_process else '线程'}渲染 {len(confs)} 个视频片段，共 {total_frames} 帧")
+            
+            try:
+                with executor:
+                    # 长任务优先提交，空闲的工作线程/进程从共享队列中领取剩余任务
+                    order = sorted(primary.values(), key=lambda k: items[k][3], reverse=True)
+                    futures = {executor.submit(render_segment, confs[k]): k for k in order}
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            for pending in futures:
+                                pending.cancel()
+                            error_msg = f"视频生成阶段出错 (片段 {futures[future]}): {str(e)}"
+                            logger.error(error_msg)
+                            with progress_lock:
+                                error_dict[task_id] = error_msg
+                            raise
+                        with progress_lock:
+                            progress_dict[task_id] += 60 * items[futures[future]][3] / total_frames
+            finally:
+                # 所有工作线程/进程结束后再释放解码缓存
+                if frame_cache_path:
+                    close_frame_cache(frame_cache_path)
+            
+            # 任务内重复的片段直接复制
+            for k, source in duplicates:
+                shutil.copyfile(output_paths[source], output_paths[k])
+                with progress_lock:
+                    progress_dict[task_id] += 60 * items[k][3] / total_frames
+            if use_segment_cache:
+                prune_segment_cache(SEGMENT_CACHE_DIR, int(data.get('segment_cache_max_bytes', DEFAULT_SEGMENT_CACHE_BYTES)))
+            
+            # 合并视频
+            logger.info("开始合并视频文件")
+            with progress_lock:
+                progress_dict[task_id] = 80
+            
+            merge_VA(output_paths, f'{cache_dir}/finalPicture.mp4', data.get('ffmpeg_path'), f'{cache_dir}/filelist_v.txt')
+        
+        # 按时间线一次性渲染整段视频，无需逐句片段和合并
+        # render_mode 为 'timeline' 时在Python中逐帧合成，为 'ffmpeg' 时交给ffmpeg滤镜完成，
+        # 为 'ass' 时生成ASS字幕并由libass烧录
+        def generate_video_timeline(tmls, movie_path, render_mode='timeline'):
+            with progress_lock:
+                base_progress = progress_dict[task_id]
+            
+            def on_progress(done, total):
+                with progress_lock:
+                    progress_dict[task_id] = base_progress + (80 - base_progress) * done / max(total, 1e-6)
+            
+            style_args = (
+                data.get('font_path_chinese'),
+                int(data.get('chinese_text_size')),
+                tuple(data.get('chinese_text_color')),
+                float(data.get('chinese_text_position')),
+                float(data.get('line_spacing')),
+            )
+            output_path = os.path.abspath(f'{cache_dir}/finalPicture.mp4')
+            try:
+                if render_mode == 'ffmpeg':
+                    render_with_ffmpeg(
+                        movie_path,
+                        output_path,
+                        sentences,
+                        tmls,
+                        *style_args,
+                        ffmpeg_path=data.get('ffmpeg_path'),
+                        work_dir=f'{cache_dir}/ffmpeg_render',
+                        encoder_options=data.get('encoder_options'),
+                        progress_callback=on_progress
+                    )
+                elif render_mode == 'ass':
+                    render_with_ass(
+                        movie_path,
+                        output_path,
+                        sentences,
+                        tmls,
+                        *style_args,
+                        ffmpeg_path=data.get('ffmpeg_path'),
+                        ass_path=os.path.abspath(f'{cache_dir}/subtitles.ass'),
+                        encoder_options=data.get('encoder_options'),
+                        progress_callback=on_progress
+                    )
+                else:
+                    # 背景视频比时间线短、需要循环播放时才值得先解码缓存
+                    _, _, fps, total_frames = probe_video(movie_path)
+                    frame_cache_path = None
+                    if tmls and fps > 0 and total_frames > 1 and time_to_frame(tmls[-1][1], fps) > total_frames:
+                        frame_cache_path = prepare_frame_cache(movie_path)
+                    try:
+                        render_timeline(
+                            movie_path,
+                            output_path,
+                            sentences,
+                            tmls,
+                            *style_args,
+                            blur_mode=data.get('blur_mode', 'quality'),
+                            compose_mode=data.get('compose_mode', 'numpy'),
+                            encoder=data.get('encoder', 'ffmpeg'),
+                            ffmpeg_path=data.get('ffmpeg_path'),
+                            encoder_options=data.get('encoder_options'),
+                            progress_callback=on_progress,
+                            frame_cache_path=frame_cache_path
+                        )
+                    finally:
+                        # 渲染出错时也要释放解码缓存，否则缓存文件仍被占用，无法删除任务目录
+                        if frame_cache_path:
+                            close_frame_cache(frame_cache_path)
+            except Exception as e:
+                error_msg = f"视频生成阶段出错 ({render_mode}渲染): {str(e)}"
+                logger.error(error_msg)
+                with progress_lock:
+                    error_dict[task_id] = error_msg
+                raise
+        
+        # 在最终视频旁保存ASS外挂字幕
+        def export_ass_sidecar(tmls, movie_path, final_path):
+            ass_path = os.path.splitext(final_path)[0] + '.ass'
+            cached_ass = f'{cache_dir}/subtitles.ass'
+            if os.path.exists(cached_ass):
+                shutil.copy(cached_ass, ass_path)
+            else:
+                width, height = probe_frame_size(movie_path)
+                write_ass_file(
+                    ass_path,
+                    sentences,
+                    tmls,
+                    width,
+                    height,
+                    data.get('font_path_chinese'),
+                    int(data.get('chinese_text_size')),
+                    tuple(data.get('chinese_text_color')),
+                    float(data.get('chinese_text_position')),
+                    float(data.get('line_spacing'))
+                )
+            logger.info(f"外挂字幕已保存: {ass_path}")
+        
         # 主处理函数
         def process_task():
             try:
@@ -327,6 +598,7 @@ def upload_file():
                 
                 # 下载或获取视频
                 movie_path = download_video()
+                render_path = ingest_background(movie_path)
                 
                 # 生成语音
                 tmls = generate_audio()
@@ -336,93 +608,89 @@ def upload_file():
                     if error_dict[task_id]:
                         raise Exception(error_dict[task_id])
                 
-                # 生成视频片段
-                threads = []
-                for i in range(thnum):
-                    video_paths.append(os.path.abspath(f'{cache_dir}/finalPicture_{i}.mp4'))
-                    thread = threading.Thread(
-                        target=generate_video_method,
-                        args=(
-                            x[i],
-                            tmls,
-                            i,
-                            stage_weights,
-                            task_id,
-                            sentences[x[i]:x[i+1]],
-                            movie_path,
-                            data.get('ffmpeg_path'),
-                            data.get('font_path_chinese'),
-                            int(data.get('chinese_text_size')),
-                            tuple(data.get('chinese_text_color')),
-                            float(data.get('chinese_text_position')),
-                            float(data.get('line_spacing')),
-                        )
-                    )
-                    threads.append(thread)
-                    thread.start()
-                
-                # 等待所有线程完成
-                for thread in threads:
-                    thread.join()
-                
-                # 检查是否有错误
-                with progress_lock:
-                    if error_dict[task_id]:
-                        raise Exception(error_dict[task_id])
-                
-                # 合并音频
-                logger.info("开始合并音频文件")
-                merge_VA(audio_paths, f'{cache_dir}/finalAudio.mp3', data.get('ffmpeg_path'), f'{cache_dir}/filelist.txt')
+                # 合并音频（numpy音频引擎在渲染画面前拼接旁白，字幕按旁白的采样位置对齐）
+                if use_pcm_audio:
+                    logger.info("开始合并音频文件")
+                    tmls = assemble_narration(tmls)
                 
-                # 合并视频
-                logger.info("开始合并视频文件")
-                with progress_lock:
-                    progress_dict[task_id] = 80
-                
-                merge_VA(video_paths, f'{cache_dir}/finalPicture.mp4', data.get('ffmpeg_path'), f'{cache_dir}/filelist_v.txt')
-                
-                with progress_lock:
-                    progress_dict[task_id] = 90
-                
-                # 合并视频和音频
-                logger.info("开始合并视频和音频")
-                final_video_no_bgm = f"{cache_dir}/final_video_nobgm.mp4"
-                command = [
-                    data.get('ffmpeg_path'),
-                    '-y', 
-                    '-i', os.path.abspath(f'{cache_dir}/finalPicture.mp4'),
-                    '-i', os.path.abspath(f'{cache_dir}/finalAudio.mp3'),
-                    '-c:v', 'copy',
-                    '-c:a', 'aac',
-                    '-strict', 'experimental',
-                    final_video_no_bgm
-                ]
-                
-                process = subprocess.run(command, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                if process.returncode != 0:
-                    error_msg = f"视频和音频合并失败"
-                    logger.error(error_msg)
-                    with progress_lock:
-                        error_dict[task_id] = error_msg
-                    raise Exception(error_msg)
+                # 生成视频
+                render_mode = data.get('render_mode', 'segment')
+                if render_mode in ('timeline', 'ffmpeg', 'ass'):
+                    generate_video_timeline(tmls, render_path, render_mode)
+                else:
+                    generate_video_segments(tmls, render_path)
                 
-                # 添加背景音乐
-                logger.info("开始添加背景音乐")
                 final_path = f"{data.get('save_path')}/final_video_{task_id}.mp4"
-                
-                if not os.path.exists(final_video_no_bgm):
-                    raise Exception("合成的无背景音乐视频文件不存在")
-                
                 # 确保保存目录存在
                 os.makedirs(os.path.dirname(final_path), exist_ok=True)
                 
-                # 添加背景音乐
-                add_bgm_ffmpeg(final_video_no_bgm, data.get('bgm'), final_path, music_volume=data.get("bgm_volumn"))
+                if use_pcm_audio:
+                    with progress_lock:
+                        progress_dict[task_id] = 90
+                    
+                    # 画面、无损旁白和背景音乐一次合成，音频只编码一次AAC
+                    logger.info("开始合并视频、旁白和背景音乐")
+                    try:
+                        mux_narration_with_bgm(
+                            os.path.abspath(f'{cache_dir}/finalPicture.mp4'),
+                            os.path.abspath(f'{cache_dir}/finalAudio.wav'),
+                            data.get('bgm'),
+                            final_path,
+                            music_volume=data.get("bgm_volumn"),
+                            ffmpeg_path=data.get('ffmpeg_path')
+                        )
+                    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                        error_msg = f"视频和音频合并失败: {str(e)}"
+                        logger.error(error_msg)
+                        with progress_lock:
+                            error_dict[task_id] = error_msg
+                        raise Exception(error_msg)
+                else:
+                    # 合并音频
+                    logger.info("开始合并音频文件")
+                    merge_VA(audio_paths, f'{cache_dir}/finalAudio.mp3', data.get('ffmpeg_path'), f'{cache_dir}/filelist.txt')
+                    
+                    with progress_lock:
+                        progress_dict[task_id] = 90
+                    
+                    # 合并视频和音频
+                    logger.info("开始合并视频和音频")
+                    final_video_no_bgm = f"{cache_dir}/final_video_nobgm.mp4"
+                    command = [
+                        data.get('ffmpeg_path'),
+                        '-y', 
+                        '-i', os.path.abspath(f'{cache_dir}/finalPicture.mp4'),
+                        '-i', os.path.abspath(f'{cache_dir}/finalAudio.mp3'),
+                        '-c:v', 'copy',
+                        '-c:a', 'aac',
+                        '-strict', 'experimental',
+                        final_video_no_bgm
+                    ]
+                    
+                    process = subprocess.run(command, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    if process.returncode != 0:
+                        error_msg = f"视频和音频合并失败"
+                        logger.error(error_msg)
+                        with progress_lock:
+                            error_dict[task_id] = error_msg
+                        raise Exception(error_msg)
+                    
+                    # 添加背景音乐
+                    logger.info("开始添加背景音乐")
+                    if not os.path.exists(final_video_no_bgm):
+                        raise Exception("合成的无背景音乐视频文件不存在")
+                    
+                    # 添加背景音乐
+                    add_bgm_ffmpeg(final_video_no_bgm, data.get('bgm'), final_path, music_volume=data.get("bgm_volumn"))
                 
                 # 检查最终输出文件是否存在
                 if not os.path.exists(final_path):
                     raise Exception(f"添加背景音乐后的最终视频文件未生成")
                 
+                # 保存外挂字幕
+                if render_mode == 'ass' or data.get('export_ass'):
+                    export_ass_sidecar(tmls, render_path, final_path)
+                
                 with progress_lock:
                     progress_dict[task_id] = 100
                 
@@ -435,10 +703,13 @@ def upload_file():
                     # 如果是抖音爬取的视频，同时删除下载的视频文件
                     if data.get('trans_method') == "抖音爬取" and movie_path and os.path.exists(movie_path):
                         os.remove(movie_path)
+                        remove_keyframe_index(movie_path)
                 except Exception as e:
                     logger.error(f"清理资源失败: {str(e)}")
                 
                 logger.info(f"任务 {task_id} 成功完成，耗时: {time.time() - start_time:.2f}秒")
+                logger.info(f"字体/换行缓存统计: {text_cache_stats()}")
+                logger.info(f"语音缓存统计: {tts_cache_stats()}")
                 
             except Exception as e:
                 error_msg = f"视频处理过程出错: {str(e)}"
@@ -455,6 +726,7 @@ def upload_file():
                     # 如果是抖音爬取的视频，同时删除下载的视频文件
                     if data.get('trans_method') == "抖音爬取" and 'movie_path' in locals() and movie_path and os.path.exists(movie_path):
                         os.remove(movie_path)
+                        remove_keyframe_index(movie_path)
                 except Exception as cleanup_err:
                     logger.error(f"清理资源失败: {str(cleanup_err)}")
         
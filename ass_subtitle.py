@@ -0,0 +1,182 @@
+import os
+import logging
+from make_image import layout_subtitle
+from ffmpeg_render import probe_frame_size, background_input_args, build_blur_band_graph, run_ffmpeg_with_progress
+from video_encoder import EVEN_SIZE_FILTER, ffmpeg_encoder_args
+
+logger = logging.getLogger(__name__)
+
+def _ass_time(seconds):
+    """秒数转换为ASS时间格式 H:MM:SS.cc"""
+    centiseconds = int(round(max(0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def _ass_color(color, alpha=0):
+    """RGB颜色转换为ASS颜色 &HAABBGGRR（alpha为0表示不透明）"""
+    r, g, b = color[:3]
+    return f"&H{alpha:02X}{b:02X}{g:02X}{r:02X}"
+
+def _ass_text(text):
+    """转义ASS中有特殊含义的字符"""
+    return text.replace('\\', '＼').replace('{', '｛').replace('}', '｝')
+
+def _font_name(font):
+    """从PIL字体对象获取字体名称，供libass按名称匹配字体"""
+    family, style = font.getname()
+    if style and style.lower() not in ('regular', 'normal'):
+        return f"{family} {style}"
+    return family
+
+def write_ass_file(
+    output_path,
+    sentences,
+    tmls,
+    width,
+    height,
+    font_path_chinese,
+    chinese_text_size=10,
+    chinese_text_color=(0,0,0),
+    chinese_text_posotion=1.75,
+    line_spacing=1.5,
+    ):
+    """
+    根据字幕和时间线生成ASS字幕文件
+
+    排版沿用 make_image.layout_subtitle，每行字幕单独定位（ASS本身不支持行间距），
+    与逐帧绘制的位置一致。
+
+    返回:
+        {模糊区域: [(开始时间, 结束时间), ...]}，供烧录时模糊字幕背景
+    """
+    if len(sentences) != len(tmls):
+        raise ValueError(f"字幕数量({len(sentences)})与时间线数量({len(tmls)})不一致")
+
+    font_name = None
+    font_size = None
+    bands = {}
+    events = []
+    for sentence, (start_time, end_time) in zip(sentences, tmls):
+        font_chinese, placements, blur_area = layout_subtitle(
+            width,
+            height,
+            sentence,
+            font_path_chinese,
+            chinese_text_size,
+            chinese_text_posotion,
+            line_spacing
+        )
+        if font_name is None:
+            ascent, descent = font_chinese.getmetrics()
+            font_name = _font_name(font_chinese)
+            font_size = ascent + descent
+        x0, y0, x1, y1 = blur_area
+        roi = (max(0, x0), max(0, y0), min(width, x1), min(height, y1))
+        if roi[2] > roi[0] and roi[3] > roi[1]:
+            bands.setdefault(roi, []).append((start_time, end_time))
+        for line, _, y in placements:
+            # \an8 以顶部中点定位，与PIL按行顶部绘制、水平居中一致
+            events.append(
+                f"Dialogue: 0,{_ass_time(start_time)},{_ass_time(end_time)},Default,,0,0,0,,"
+                f"{{\\an8\\pos({width // 2},{y})}}{_ass_text(line)}"
+            )
+
+    # 原实现的阴影为不透明黑色、偏移2像素
+    header = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 2",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{font_name or 'Arial'},{font_size or 20},{_ass_color(chinese_text_color)},"
+        f"{_ass_color(chinese_text_color)},&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,0,2,8,0,0,0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    with open(output_path, 'w', encoding='utf-8-sig') as f:
+        f.write('\n'.join(header + events) + '\n')
+    logger.info(f"ASS字幕已生成: {output_path}")
+    return bands
+
+def _escape_filter_path(path):
+    """转义滤镜参数中的路径（Windows盘符冒号、反斜杠）"""
+    return os.path.abspath(path).replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
+
+def render_with_ass(
+    input_video_path,
+    output_video_path,
+    sentences,
+    tmls,
+    font_path_chinese,
+    chinese_text_size=10,
+    chinese_text_color=(0,0,0),
+    chinese_text_posotion=1.75,
+    line_spacing=1.5,
+    ffmpeg_path="./ffmpeg/bin/ffmpeg.exe",
+    ass_path="./subtitles.ass",
+    encoder_options=None,
+    progress_callback=None
+    ):
+    """
+    生成ASS字幕并用ffmpeg的subtitles滤镜（libass）烧录到背景视频上
+
+    字幕背景横条的模糊同样在ffmpeg滤镜中完成，见 ffmpeg_render.build_blur_band_graph。
+
+    参数:
+        ass_path: 生成的ASS字幕文件路径，可作为外挂字幕保留
+        其余参数同 ffmpeg_render.render_with_ffmpeg
+    """
+    width, height = probe_frame_size(input_video_path)
+    duration = tmls[-1][1] if tmls else 0
+    bands = write_ass_file(
+        ass_path,
+        sentences,
+        tmls,
+        width,
+        height,
+        font_path_chinese,
+        chinese_text_size,
+        chinese_text_color,
+        chinese_text_posotion,
+        line_spacing
+    )
+
+    graph, current = build_blur_band_graph(bands)
+    fonts_dir = os.path.dirname(os.path.abspath(font_path_chinese))
+    graph.append(
+        f"[{current}]subtitles=filename='{_escape_filter_path(ass_path)}':"
+        f"fontsdir='{_escape_filter_path(fonts_dir)}'[vsub]"
+    )
+    graph.append(f"[vsub]{EVEN_SIZE_FILTER}[vout]")
+    script_path = os.path.splitext(os.path.abspath(ass_path))[0] + '_filter_graph.txt'
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write(';\n'.join(graph))
+
+    cmd = [
+        ffmpeg_path,
+        '-y',
+        '-hide_banner',
+        '-loglevel', 'error',
+    ]
+    cmd += background_input_args(input_video_path)
+    cmd += [
+        '-filter_complex_script', script_path,
+        '-map', '[vout]',
+        '-t', f"{duration:.3f}",
+        '-an',
+    ]
+    cmd += ffmpeg_encoder_args(encoder_options, pad_even=False)
+    cmd.append(output_video_path)
+
+    logger.info(f"使用libass烧录 {len(sentences)} 句字幕，时长 {duration:.2f} 秒")
+    run_ffmpeg_with_progress(cmd, duration, progress_callback)
+    logger.info(f"视频处理完成: {output_video_path}")
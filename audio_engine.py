@@ -0,0 +1,198 @@
+import wave
+import logging
+import subprocess
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 配置subprocess启动信息以隐藏窗口
+startupinfo = subprocess.STARTUPINFO()
+startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+# 静音判定阈值（峰值，相对满幅），与 get_video.SILENCE_TRIM_FILTER 的 start_threshold=-50dB:detection=peak 一致
+SILENCE_THRESHOLD_DB = -50
+# 每句语音结尾补充的静音时长（秒）
+TAIL_SILENCE = 0.3
+# 需要ffmpeg解码时使用的采样率和声道数
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHANNELS = 2
+# AAC每帧的采样数，字幕时间线与旁白的偏差应在一帧以内
+AAC_FRAME_SAMPLES = 1024
+
+def read_wav(path):
+    """
+    不启动ffmpeg，直接读取16位PCM的WAV文件
+
+    返回:
+        (int16数组，形状为 (采样数, 声道数), 采样率)；不是16位PCM的WAV时返回None
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+        if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            return None
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != 2 or wav.getcomptype() != 'NONE':
+                return None
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            data = wav.readframes(wav.getnframes())
+    except (OSError, EOFError, wave.Error):
+        return None
+    return np.frombuffer(data, dtype='<i2').reshape(-1, channels), rate
+
+def write_wav(path, pcm, rate):
+    """把 (采样数, 声道数) 的int16数组写为WAV文件"""
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(pcm.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.ascontiguousarray(pcm, dtype='<i2').tobytes())
+
+def decode_pcm(path, ffmpeg_path, sample_rate=None, channels=None):
+    """
+    把音频解码为PCM数组
+
+    16位PCM的WAV（腾讯云、阿里云默认返回的格式）直接读取；其它格式，或需要换采样率/声道时，
+    启动一次ffmpeg解码到管道。
+
+    参数:
+        sample_rate, channels: 指定输出的采样率和声道数，None 表示保持原样
+    返回:
+        (int16数组，形状为 (采样数, 声道数), 采样率)
+    """
+    wav = read_wav(path)
+    if wav is not None:
+        pcm, rate = wav
+        if (sample_rate is None or rate == sample_rate) and (channels is None or pcm.shape[1] == channels):
+            return pcm, rate
+
+    rate = sample_rate or DEFAULT_SAMPLE_RATE
+    channels = channels or DEFAULT_CHANNELS
+    cmd = [
+        ffmpeg_path,
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-i', path,
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(rate),
+        '-ac', str(channels),
+        '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, startupinfo=startupinfo)
+    if result.returncode != 0:
+        raise RuntimeError(f"音频解码失败: {result.stderr.decode('utf-8', errors='ignore').strip()}")
+    return np.frombuffer(result.stdout, dtype='<i2').reshape(-1, channels), rate
+
+def trim_silence(pcm, threshold_db=SILENCE_THRESHOLD_DB):
+    """
+    去除前后静音：任一声道的峰值超过阈值的第一个和最后一个采样之外的部分都去掉
+
+    全部为静音时返回空数组。
+    """
+    threshold = 32768 * 10 ** (threshold_db / 20)
+    loud = np.flatnonzero(np.abs(pcm.astype(np.int32)).max(axis=1) > threshold)
+    if len(loud) == 0:
+        return pcm[:0]
+    return pcm[loud[0]:loud[-1] + 1]
+
+def pad_tail(pcm, rate, seconds=TAIL_SILENCE):
+    """在结尾补充 seconds 秒静音"""
+    silence = np.zeros((int(round(seconds * rate)), pcm.shape[1]), dtype=pcm.dtype)
+    return np.concatenate([pcm, silence])
+
+def process_clip(input_file, output_file, ffmpeg_path, trim=True, tail_silence=TAIL_SILENCE):
+    """
+    单句语音的后处理：解码一次，用numpy去除前后静音并补充结尾静音，保存为WAV
+
+    保持TTS返回的采样率和声道数，WAV直接写出不经过编码；时长由采样数计算。
+
+    返回:
+        输出音频时长（秒）
+    """
+    pcm, rate = decode_pcm(input_file, ffmpeg_path)
+    if trim:
+        pcm = trim_silence(pcm)
+    pcm = pad_tail(pcm, rate, tail_silence)
+    write_wav(output_file, pcm, rate)
+    return len(pcm) / rate
+
+def load_narration(input_files, ffmpeg_path):
+    """
+    在内存中按顺序拼接各句语音
+
+    采样率以第一句为准，其它采样率的句子（如混用语音服务）用ffmpeg重采样；单声道与立体声混合时统一为立体声。
+
+    返回:
+        (拼接后的PCM数组, 采样率, 各句开始的采样位置列表)
+    """
+    clips = []
+    rate = None
+    for path in input_files:
+        pcm, clip_rate = decode_pcm(path, ffmpeg_path, sample_rate=rate)
+        rate = clip_rate
+        clips.append(pcm)
+    channels = max(pcm.shape[1] for pcm in clips)
+    clips = [np.repeat(pcm, channels, axis=1) if pcm.shape[1] == 1 and channels > 1 else pcm for pcm in clips]
+    offsets = np.cumsum([0] + [len(pcm) for pcm in clips[:-1]]).tolist()
+    return np.concatenate(clips), rate, offsets
+
+def encode_pcm(pcm, rate, output_file, ffmpeg_path, codec_args=None):
+    """
+    把PCM数组通过管道交给ffmpeg编码一次
+
+    参数:
+        codec_args: 编码参数，默认按输出文件扩展名由ffmpeg选择编码器，并输出44.1kHz
+    """
+    cmd = [
+        ffmpeg_path,
+        '-y',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-f', 's16le',
+        '-ar', str(rate),
+        '-ac', str(pcm.shape[1]),
+        '-i', '-',
+    ]
+    cmd += codec_args if codec_args is not None else ['-ar', str(DEFAULT_SAMPLE_RATE)]
+    cmd.append(output_file)
+    result = subprocess.run(
+        cmd,
+        input=np.ascontiguousarray(pcm, dtype='<i2').tobytes(),
+        capture_output=True,
+        startupinfo=startupinfo
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"音频编码失败: {result.stderr.decode('utf-8', errors='ignore').strip()}")
+
+def build_narration(input_files, output_file, ffmpeg_path):
+    """
+    把各句处理好的语音在内存中拼接成完整旁白
+
+    output_file 为 .wav 时直接写出无损PCM，留到最终合成视频时一次编码为AAC；其它格式在这里编码一次。
+
+    返回:
+        (各句的 [开始秒, 结束秒] 列表, 采样率)，按采样位置计算，与旁白音轨完全对齐
+    """
+    pcm, rate, offsets = load_narration(input_files, ffmpeg_path)
+    if output_file.lower().endswith('.wav'):
+        write_wav(output_file, pcm, rate)
+    else:
+        encode_pcm(pcm, rate, output_file, ffmpeg_path)
+    ends = offsets[1:] + [len(pcm)]
+    logger.info(f"旁白音轨已生成: {len(input_files)} 句，{len(pcm) / rate:.2f} 秒")
+    return [[start / rate, end / rate] for start, end in zip(offsets, ends)], rate
+
+def timeline_drift(tmls, narration_timeline, rate):
+    """
+    字幕时间线与旁白实际位置的最大偏差（采样数），比较每句的开始和结束
+
+    大于 AAC_FRAME_SAMPLES 说明字幕与语音会明显不同步。
+    """
+    if len(tmls) != len(narration_timeline):
+        raise ValueError(f"时间线数量({len(tmls)})与旁白句数({len(narration_timeline)})不一致")
+    drift = 0
+    for (start, end), (narration_start, narration_end) in zip(tmls, narration_timeline):
+        drift = max(drift, abs(start - narration_start) * rate, abs(end - narration_end) * rate)
+    return int(round(drift))
@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import subprocess
+from video_encoder import EVEN_SIZE_FILTER, ffmpeg_encoder_args
+from frame_cache import is_still_image
+from keyframe_index import remove_keyframe_index
+
+logger = logging.getLogger(__name__)
+
+# 配置subprocess启动信息以隐藏窗口
+startupinfo = subprocess.STARTUPINFO()
+startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+# 转码后中间文件的缓存目录
+NORMALIZED_CACHE_DIR = './normalized_cache'
+# 中间文件缓存的默认大小上限（字节），超过后删除最久未使用的文件
+DEFAULT_NORMALIZED_CACHE_BYTES = 4 * 1024 ** 3
+# 记录源文件摘要的索引文件，路径、大小、修改时间都不变时不再重新计算
+DIGEST_INDEX_NAME = 'digests.json'
+
+_digest_lock = threading.Lock()
+
+# 转码后中间文件的默认参数
+DEFAULT_NORMALIZE_OPTIONS = {
+    'fps': 30,              # 恒定帧率
+    'height': None,         # 目标高度（宽度按比例缩放为偶数），None表示保持原分辨率
+    'gop_seconds': 1,       # 关键帧间隔（秒），间隔越短定位越快
+    'crf': 18,              # 中间文件的质量系数，比最终输出略高以减少二次压缩损失
+}
+
+def file_digest(input_video_path, cache_dir=NORMALIZED_CACHE_DIR):
+    """
+    源文件内容的SHA-1，按 路径+大小+修改时间 记录在缓存目录的索引中
+
+    同一文件再次使用时直接读取索引，不必重新读取整个文件；索引中已不存在的文件顺便清除。
+    背景换了路径（如重新下载）也能按内容识别为同一个。
+    """
+    path = os.path.abspath(input_video_path)
+    stat = os.stat(path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    index_path = os.path.join(cache_dir, DIGEST_INDEX_NAME)
+    with _digest_lock:
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        entry = index.get(path)
+        if entry and entry[:2] == signature:
+            return entry[2]
+
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+
+        index = {key: value for key, value in index.items() if os.path.exists(key)}
+        index[path] = signature + [digest]
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f'{index_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            logger.warning(f"保存背景摘要索引失败: {str(e)}")
+        return digest
+
+def _content_hash(input_video_path, options, cache_dir):
+    """按文件内容和转码参数计算缓存名，同一背景重复上传或下载也只转码一次"""
+    sha1 = hashlib.sha1(file_digest(input_video_path, cache_dir).encode('utf-8'))
+    sha1.update(repr(sorted(options.items())).encode('utf-8'))
+    return sha1.hexdigest()
+
+def normalize_background(input_video_path, ffmpeg_path, cache_dir=NORMALIZED_CACHE_DIR, normalize_options=None):
+    """
+    把背景视频转码为恒定帧率、短GOP、指定分辨率的中间文件
+
+    抖音下载的视频常为可变帧率、关键帧间隔很长，按 CAP_PROP_FPS 换算时间会有偏差，定位也慢。
+    转码一次后，后续渲染都使用中间文件。静态图片不需要转码，原样返回。
+
+    参数:
+        input_video_path: 背景视频路径
+        ffmpeg_path: ffmpeg路径
+        cache_dir: 中间文件缓存目录，文件名为内容哈希
+        normalize_options: 覆盖 DEFAULT_NORMALIZE_OPTIONS 中的参数
+    返回:
+        中间文件路径
+    """
+    if is_still_image(input_video_path):
+        return input_video_path
+    options = dict(DEFAULT_NORMALIZE_OPTIONS)
+    options.update(normalize_options or {})
+
+    os.makedirs(cache_dir, exist_ok=True)
+    output_path = os.path.abspath(os.path.join(cache_dir, f'{_content_hash(input_video_path, options, cache_dir)}.mp4'))
+    if os.path.exists(output_path):
+        # 更新修改时间，清理时按最近使用排序
+        os.utime(output_path)
+        logger.info(f"使用已转码的背景视频: {output_path}")
+        return output_path
+
+    fps = int(options['fps'])
+    filters = [f"fps={fps}"]
+    if options['height']:
+        filters.append(f"scale=-2:{int(options['height'])}")
+    filters.append(EVEN_SIZE_FILTER)
+    gop = max(1, int(round(fps * options['gop_seconds'])))
+    # 临时文件保留.mp4扩展名，ffmpeg据此选择封装格式；文件名按进程和线程区分，同一背景的并发任务不会写入同一个文件
+    tmp_path = output_path[:-4] + f'.{os.getpid()}.{threading.get_ident()}.tmp.mp4'
+    cmd = [
+        ffmpeg_path,
+        '-y',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-i', input_video_path,
+        '-an',
+        '-vf', ','.join(filters),
+    ]
+    cmd += ffmpeg_encoder_args({'crf': options['crf']}, pad_even=False)
+    # 固定关键帧间隔，关闭场景切换插入关键帧和B帧，保证每个GOP长度一致
+    cmd += ['-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0', '-bf', '0']
+    cmd += ['-movflags', '+faststart', tmp_path]
+
+    logger.info(f"转码背景视频: {input_video_path} -> {fps}fps，GOP {gop} 帧")
+    result = subprocess.run(cmd, capture_output=True, startupinfo=startupinfo)
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"背景视频转码失败: {result.stderr.decode('utf-8', errors='ignore').strip()}")
+    os.replace(tmp_path, output_path)
+    logger.info(f"背景视频转码完成: {output_path}")
+    return output_path
+
+def prune_normalized_cache(cache_dir=NORMALIZED_CACHE_DIR, max_bytes=DEFAULT_NORMALIZED_CACHE_BYTES, keep=None):
+    """
+    缓存超过 max_bytes 时按最近使用时间删除最旧的中间文件
+
+    参数:
+        keep: 当前任务正在使用的中间文件，不删除
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    keep = os.path.abspath(keep) if keep else None
+    entries = []
+    for name in os.listdir(cache_dir):
+        # 正在转码的临时文件不计入
+        if not name.endswith('.mp4') or name.endswith('.tmp.mp4'):
+            continue
+        path = os.path.abspath(os.path.join(cache_dir, name))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            remove_keyframe_index(path)
+            total -= size
+        except OSError as e:
+            logger.warning(f"删除背景转码缓存失败: {path} {str(e)}")
@@ -0,0 +1,52 @@
+import time
+import argparse
+import numpy as np
+import cv2
+from make_image import BLUR_BACKENDS, BLUR_MODES, blur_band, build_subtitle_overlay, apply_subtitle_overlay
+
+# 测试分辨率（宽, 高）
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4K': (3840, 2160),
+}
+
+def make_test_frame(width, height, seed=0):
+    """生成带纹理的测试帧，避免纯色背景导致模糊结果失真"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(1, height // 20), max(1, width // 20), 3), dtype=np.uint8)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+
+def bench_blur(font_path, text, frames=20):
+    """统计各分辨率下每种模糊实现的单帧耗时（毫秒）以及与原实现的差异"""
+    names = list(BLUR_BACKENDS) + [f"{mode}({backend})" for mode, backend in BLUR_MODES.items()]
+    print(f"{'分辨率':<8}{'模糊实现':<20}{'仅模糊 ms/帧':>14}{'整帧 ms/帧':>12}{'平均差异':>10}")
+    for label, (width, height) in RESOLUTIONS.items():
+        frame = make_test_frame(width, height)
+        overlay = build_subtitle_overlay(width, height, text, font_path)
+        x0, y0, x1, y1 = overlay.roi
+        band = np.ascontiguousarray(frame[y0:y1, x0:x1])
+        reference = blur_band(band, 'pil').astype(np.int16)
+        for name in names:
+            blur_mode = name.split('(')[0]
+            result = blur_band(band, blur_mode)
+            diff = np.abs(result.astype(np.int16) - reference).mean()
+
+            start = time.perf_counter()
+            for _ in range(frames):
+                blur_band(band, blur_mode)
+            blur_ms = (time.perf_counter() - start) / frames * 1000
+
+            start = time.perf_counter()
+            for _ in range(frames):
+                apply_subtitle_overlay(frame, overlay, blur_mode)
+            frame_ms = (time.perf_counter() - start) / frames * 1000
+            print(f"{label:<8}{name:<20}{blur_ms:>14.2f}{frame_ms:>12.2f}{diff:>10.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="字幕模糊横条性能测试")
+    parser.add_argument('--font', default='./base/font/AlibabaPuHuiTi-3-115-Black.otf', help='字体路径')
+    parser.add_argument('--text', default='这是一句用于测试模糊性能的字幕文字', help='测试字幕')
+    parser.add_argument('--frames', type=int, default=20, help='每项测试的帧数')
+    args = parser.parse_args()
+    bench_blur(args.font, args.text, args.frames)
@@ -0,0 +1,48 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from get_video import render_segment, init_render_worker
+from ffmpeg_render import probe_frame_size
+
+def bench_render(background, font_path, ffmpeg_path, segments, seconds, workers, encoder):
+    """分别用线程池和进程池渲染相同的视频片段，比较总耗时"""
+    width, height = probe_frame_size(background)
+    font_size = min(width, height) // 10
+    work_dir = tempfile.mkdtemp(prefix='bench_render_')
+    try:
+        for name, executor_cls, kwargs in [
+            ('thread', ThreadPoolExecutor, {}),
+            ('process', ProcessPoolExecutor, {'initializer': init_render_worker, 'initargs': (font_path, font_size)}),
+        ]:
+            confs = [{
+                "input_video_path": background,
+                "output_video_path": os.path.join(work_dir, f'{name}_{idx}.mp4'),
+                "chinese_text": f"第{idx + 1}句测试字幕，用于比较线程池与进程池",
+                "font_path_chinese": font_path,
+                "start_time": idx * seconds,
+                "end_time": (idx + 1) * seconds,
+                "encoder": encoder,
+                "ffmpeg_path": ffmpeg_path,
+            } for idx in range(segments)]
+            start = time.perf_counter()
+            with executor_cls(max_workers=workers, **kwargs) as pool:
+                list(pool.map(render_segment, confs))
+            elapsed = time.perf_counter() - start
+            print(f"{name:<8} {segments} 个片段 x {seconds} 秒，{workers} 个并发: {elapsed:.2f} 秒")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="线程池与进程池渲染性能对比")
+    parser.add_argument('background', help='背景视频路径')
+    parser.add_argument('--font', default='./base/font/AlibabaPuHuiTi-3-115-Black.otf', help='字体路径')
+    parser.add_argument('--ffmpeg', default='./ffmpeg/bin/ffmpeg.exe', help='ffmpeg路径')
+    parser.add_argument('--segments', type=int, default=8, help='片段数量')
+    parser.add_argument('--seconds', type=float, default=2, help='每个片段的时长（秒）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并发数')
+    parser.add_argument('--encoder', default='ffmpeg', choices=['cv2', 'ffmpeg'], help='视频写入方式')
+    args = parser.parse_args()
+    bench_render(args.background, args.font, args.ffmpeg, args.segments, args.seconds, args.workers, args.encoder)
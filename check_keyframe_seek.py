@@ -0,0 +1,85 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from keyframe_index import IndexedVideoReader, build_keyframe_index, ffprobe_path_for, frame_passthrough_args
+
+def make_vfr_clip(ffmpeg_path, output_path, frames, gop):
+    """生成可变帧率的测试视频：帧间隔在 1/30~4/30 秒之间变化，每 gop 帧一个关键帧，没有B帧"""
+    cmd = [
+        ffmpeg_path,
+        '-y',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-f', 'lavfi',
+        '-i', 'testsrc=size=64x48:rate=30',
+        '-frames:v', str(frames),
+        '-vf', "setpts='(N+2*floor(N/4)+floor(N/7))/30/TB'",
+    ]
+    cmd += frame_passthrough_args(ffmpeg_path)
+    cmd += [
+        '-c:v', 'libx264',
+        '-pix_fmt', 'yuv420p',
+        '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0', '-bf', '0',
+        output_path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+def read_frames(reader, count, size):
+    width, height = size
+    frames = []
+    for _ in range(count):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        ret, _ = reader.read(frame)
+        if not ret:
+            break
+        frames.append(frame)
+    return frames
+
+def check_keyframe_seek(ffmpeg_path, frames, gop):
+    """按关键帧索引定位可变帧率视频，检查输出帧数与索引一致、定位落在目标帧上"""
+    work_dir = tempfile.mkdtemp(prefix='check_keyframe_seek_')
+    size = (64, 48)
+    failures = 0
+    try:
+        clip_path = os.path.join(work_dir, 'vfr.mp4')
+        make_vfr_clip(ffmpeg_path, clip_path, frames, gop)
+        index = build_keyframe_index(clip_path, ffprobe_path_for(ffmpeg_path))
+        print(f"索引: {index['frame_count']} 帧，关键帧 {index['keyframes']}")
+
+        reader = IndexedVideoReader(ffmpeg_path, clip_path, index, size)
+        reader.seek(0)
+        reference = read_frames(reader, frames + 10, size)
+        reader.release()
+        if len(reference) != index['frame_count']:
+            print(f"失败: 顺序解码 {len(reference)} 帧，索引为 {index['frame_count']} 帧")
+            return 1
+
+        targets = sorted({1, gop - 1, gop, gop + 1, frames // 2, frames - 2, frames - 1})
+        reader = IndexedVideoReader(ffmpeg_path, clip_path, index, size)
+        try:
+            # 依次向前定位（同一GOP内直接向前读），再倒序定位（重新从关键帧解码）
+            for target in targets + targets[::-1]:
+                reader.seek(target)
+                got = read_frames(reader, 1, size)
+                matched = [k for k, frame in enumerate(reference) if got and np.array_equal(frame, got[0])]
+                ok = target in matched
+                failures += not ok
+                print(f"定位到第 {target} 帧: {'正确' if ok else f'错误，读到 {matched}'}")
+        finally:
+            reader.release()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("全部正确" if not failures else f"{failures} 次定位错误")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="检查关键帧索引在可变帧率视频上的定位是否准确")
+    parser.add_argument('--ffmpeg', default='./ffmpeg/bin/ffmpeg.exe', help='ffmpeg路径（同目录下需有ffprobe）')
+    parser.add_argument('--frames', type=int, default=60, help='测试视频帧数')
+    parser.add_argument('--gop', type=int, default=10, help='关键帧间隔（帧）')
+    args = parser.parse_args()
+    sys.exit(check_keyframe_seek(args.ffmpeg, args.frames, args.gop))
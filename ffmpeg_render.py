@@ -0,0 +1,190 @@
+import os
+import tempfile
+import subprocess
+import logging
+import cv2
+from make_image import BLUR_BOX_WIDTH, get_subtitle_overlay
+from video_encoder import EVEN_SIZE_FILTER, ffmpeg_encoder_args
+from frame_cache import IMAGE_EXTENSIONS, STILL_IMAGE_FPS
+
+logger = logging.getLogger(__name__)
+
+# 配置subprocess启动信息以隐藏窗口
+startupinfo = subprocess.STARTUPINFO()
+startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+
+def probe_frame_size(input_video_path):
+    """读取背景视频（或图片）的宽和高"""
+    cap = cv2.VideoCapture(input_video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"无法打开视频文件 {input_video_path}")
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    return width, height
+
+def background_input_args(input_video_path):
+    """循环读取背景的输入参数，图片不能用 -stream_loop（时间戳不前进，ffmpeg不会结束），改用 -loop 1"""
+    if os.path.splitext(input_video_path)[1].lower() in IMAGE_EXTENSIONS:
+        return ['-loop', '1', '-framerate', str(STILL_IMAGE_FPS), '-i', input_video_path]
+    return ['-stream_loop', '-1', '-i', input_video_path]
+
+def _blur_filter(width, height):
+    """与 make_image 的 'quality' 模糊一致：三次均值模糊，色度平面分辨率减半，半径也减半"""
+    # boxblur要求半径不超过对应平面短边的一半
+    luma_radius = max(0, min(BLUR_BOX_WIDTH // 2, min(width, height) // 2 - 1))
+    chroma_radius = max(0, min(BLUR_BOX_WIDTH // 4, min(width, height) // 4 - 1))
+    return f"boxblur=luma_radius={luma_radius}:luma_power=3:chroma_radius={chroma_radius}:chroma_power=3"
+
+def _filter_path(path):
+    """
+    把文件路径转义为滤镜参数（如 movie 的文件名）
+
+    路径先按滤镜选项转义（: ' \\），再按滤镜图转义（\\ ' [ ] , ;），Windows盘符中的冒号也能正确传入。
+    """
+    path = os.path.abspath(path).replace('\\', '/')
+    value = ''.join('\\' + c if c in "\\':" else c for c in path)
+    return ''.join('\\' + c if c in "\\'[],;" else c for c in value)
+
+def _enable_expr(intervals):
+    """生成overlay的enable表达式，区间为左闭右开，避免相邻两句在边界帧同时显示"""
+    return '+'.join(f"gte(t,{start:.3f})*lt(t,{end:.3f})" for start, end in intervals)
+
+def build_blur_band_graph(bands, input_label='0:v', output_label='bands'):
+    """
+    生成模糊横条部分的滤镜图
+
+    参数:
+        bands: {(x0, y0, x1, y1): [(开始时间, 结束时间), ...]}，相同位置的横条只模糊一次
+    返回:
+        (滤镜图语句列表, 输出标签)
+    """
+    if not bands:
+        return [f"[{input_label}]null[{output_label}]"], output_label
+    graph = []
+    splits = ''.join(f"[band_src{i}]" for i in range(len(bands)))
+    graph.append(f"[{input_label}]split={len(bands) + 1}[band_base]{splits}")
+    current = 'band_base'
+    for i, ((x0, y0, x1, y1), intervals) in enumerate(bands.items()):
+        graph.append(f"[band_src{i}]crop={x1 - x0}:{y1 - y0}:{x0}:{y0},{_blur_filter(x1 - x0, y1 - y0)}[band_blur{i}]")
+        next_label = output_label if i == len(bands) - 1 else f"band_out{i}"
+        graph.append(f"[{current}][band_blur{i}]overlay={x0}:{y0}:enable='{_enable_expr(intervals)}'[{next_label}]")
+        current = next_label
+    return graph, output_label
+
+def run_ffmpeg_with_progress(cmd, duration, progress_callback=None):
+    """运行ffmpeg并通过 -progress 输出回调进度 progress_callback(已完成秒数, 总秒数)"""
+    cmd = cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:]
+    # stderr写入临时文件：只读stdout时，输入较多的滤镜图写满stderr管道会让ffmpeg阻塞
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            startupinfo=startupinfo
+        )
+        for line in process.stdout:
+            key, _, value = line.decode('utf-8', errors='ignore').strip().partition('=')
+            if key == 'out_time_us' and value.isdigit() and progress_callback:
+                progress_callback(min(duration, int(value) / 1000000), duration)
+        if process.wait() != 0:
+            stderr_file.seek(0)
+            raise RuntimeError(f"ffmpeg渲染失败: {stderr_file.read().decode('utf-8', errors='ignore').strip()}")
+
+def render_with_ffmpeg(
+    input_video_path,
+    output_video_path,
+    sentences,
+    tmls,
+    font_path_chinese,
+    chinese_text_size=10,
+    chinese_text_color=(0,0,0),
+    chinese_text_posotion=1.75,
+    line_spacing=1.5,
+    ffmpeg_path="./ffmpeg/bin/ffmpeg.exe",
+    work_dir="./cache",
+    encoder_options=None,
+    progress_callback=None
+    ):
+    """
+    由ffmpeg完成逐帧合成，Python只为每句字幕栅格化一次文字图层
+
+    每句字幕的文字图层保存为PNG，横条模糊和字幕叠加都写进同一个滤镜图，
+    按 tmls 时间线用 enable 控制显示时段，逐帧处理全部在ffmpeg内部多线程完成。
+
+    参数:
+        sentences: 字幕列表
+        tmls: 每句字幕的 [开始时间, 结束时间]
+        work_dir: 存放字幕PNG和滤镜脚本的目录
+        encoder_options: 见 video_encoder.DEFAULT_ENCODER_OPTIONS
+        progress_callback: 可选，回调 progress_callback(已完成秒数, 总秒数)
+    """
+    if len(sentences) != len(tmls):
+        raise ValueError(f"字幕数量({len(sentences)})与时间线数量({len(tmls)})不一致")
+    os.makedirs(work_dir, exist_ok=True)
+    width, height = probe_frame_size(input_video_path)
+    duration = tmls[-1][1] if tmls else 0
+
+    # 每句字幕栅格化一次，相同位置的模糊横条合并处理，重复出现的句子共用一个字幕图层
+    bands = {}
+    subtitles = {}
+    for idx, sentence in enumerate(sentences):
+        overlay = get_subtitle_overlay(
+            width,
+            height,
+            sentence,
+            font_path_chinese,
+            chinese_text_size,
+            chinese_text_color,
+            chinese_text_posotion,
+            line_spacing
+        )
+        x0, y0, x1, y1 = overlay.roi
+        if x1 <= x0 or y1 <= y0:
+            continue
+        bands.setdefault(overlay.roi, []).append(tmls[idx])
+        if overlay not in subtitles:
+            png_path = os.path.abspath(os.path.join(work_dir, f'subtitle_{idx}.png'))
+            overlay.layer.save(png_path)
+            subtitles[overlay] = (png_path, overlay.roi, [])
+        subtitles[overlay][2].append(tmls[idx])
+    subtitles = list(subtitles.values())
+
+    # 组装滤镜图：先模糊横条，再逐个叠加字幕图层（重复的句子合并为一个overlay的多个显示区间）
+    # 字幕PNG在滤镜脚本中用 movie 读取，不作为 -i 输入，句子很多时命令行也不会超过Windows的长度限制
+    graph, current = build_blur_band_graph(bands)
+    for i, (png_path, (x0, y0, _, _), intervals) in enumerate(subtitles):
+        next_label = 'vsub' if i == len(subtitles) - 1 else f"sub_out{i}"
+        graph.append(f"movie={_filter_path(png_path)}[sub{i}]")
+        graph.append(f"[{current}][sub{i}]overlay={x0}:{y0}:enable='{_enable_expr(intervals)}'[{next_label}]")
+        current = next_label
+    if not subtitles:
+        graph.append(f"[{current}]null[vsub]")
+    graph.append(f"[vsub]{EVEN_SIZE_FILTER}[vout]")
+
+    script_path = os.path.abspath(os.path.join(work_dir, 'filter_graph.txt'))
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write(';\n'.join(graph))
+
+    cmd = [
+        ffmpeg_path,
+        '-y',
+        '-hide_banner',
+        '-loglevel', 'error',
+    ]
+    cmd += background_input_args(input_video_path)
+    cmd += [
+        '-filter_complex_script', script_path,
+        '-map', '[vout]',
+        '-t', f"{duration:.3f}",
+        '-an',
+    ]
+    cmd += ffmpeg_encoder_args(encoder_options, pad_even=False)
+    cmd.append(output_video_path)
+
+    logger.info(f"使用ffmpeg渲染 {len(sentences)} 句字幕（{len(subtitles)} 个字幕图层），{len(bands)} 个模糊区域，时长 {duration:.2f} 秒")
+    run_ffmpeg_with_progress(cmd, duration, progress_callback)
+    logger.info(f"视频处理完成: {output_video_path}")
@@ -0,0 +1,182 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# 解码缓存的默认大小上限（字节），超过时退回逐段流式解码
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# 作为静态背景处理的图片扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+# 静态背景在读取不到帧率时使用的帧率
+STILL_IMAGE_FPS = 25
+
+# 已打开的缓存，同一进程内的多个线程共用一份内存映射
+_open_caches = {}
+_open_caches_lock = threading.Lock()
+
+class FrameCache:
+    """
+    解码后的背景视频帧，保存为原始BGR数据并以内存映射方式读取
+
+    frames[i] 是映射文件上的只读视图，不会复制数据；多个线程或进程打开同一文件时
+    共享操作系统的页缓存，背景视频只需解码一次。
+    """
+    def __init__(self, meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.meta_path = meta_path
+        self.width = meta['width']
+        self.height = meta['height']
+        self.fps = meta['fps']
+        self.frame_count = meta['frame_count']
+        self.frames = np.memmap(
+            os.path.join(os.path.dirname(meta_path), meta['raw_file']),
+            dtype=np.uint8,
+            mode='r',
+            shape=(self.frame_count, self.height, self.width, 3)
+        )
+
+    def frame(self, index):
+        """返回第 index 帧的只读视图，超出帧数时循环"""
+        return self.frames[index % self.frame_count]
+
+    def read(self, index, out):
+        """把第 index 帧复制到工作缓冲区 out 中（字幕合成会原地修改帧）"""
+        np.copyto(out, self.frame(index))
+        return out
+
+def is_still_image(input_video_path):
+    """判断背景是否为静态图片（按扩展名，或只有一帧的视频）"""
+    if os.path.splitext(input_video_path)[1].lower() in IMAGE_EXTENSIONS:
+        return True
+    cap = cv2.VideoCapture(input_video_path)
+    try:
+        return cap.isOpened() and int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 1
+    finally:
+        cap.release()
+
+def read_still_frame(input_video_path):
+    """
+    读取静态背景的唯一一帧
+
+    返回:
+        (BGR帧, 帧率)
+    """
+    # 用 VideoCapture 而不是 imread，Windows下中文路径也能打开
+    cap = cv2.VideoCapture(input_video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"无法打开背景图片 {input_video_path}")
+    try:
+        fps = int(cap.get(cv2.CAP_PROP_FPS)) or STILL_IMAGE_FPS
+        ret, frame = cap.read()
+    finally:
+        cap.release()
+    if not ret:
+        raise ValueError(f"无法读取背景图片 {input_video_path}")
+    return frame, fps
+
+def _cache_key(input_video_path):
+    """按文件路径、大小和修改时间生成缓存名，背景视频变化后自动失效"""
+    stat = os.stat(input_video_path)
+    source = f"{os.path.abspath(input_video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+def build_frame_cache(input_video_path, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    把背景视频完整解码到 cache_dir 下的原始帧文件
+
+    参数:
+        input_video_path: 背景视频路径
+        cache_dir: 缓存目录
+        max_bytes: 解码后数据的大小上限，超过时不建立缓存
+    返回:
+        缓存描述文件路径，交给 open_frame_cache 打开；超过上限或无法解码时返回None
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = _cache_key(input_video_path)
+    meta_path = os.path.join(cache_dir, f'{key}.json')
+    if os.path.exists(meta_path):
+        return meta_path
+
+    cap = cv2.VideoCapture(input_video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"无法打开视频文件 {input_video_path}")
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    frame_bytes = width * height * 3
+    estimated_bytes = frame_bytes * int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if estimated_bytes > max_bytes:
+        cap.release()
+        logger.info(f"背景视频解码后约 {estimated_bytes / 1024 ** 2:.0f} MB，超过缓存上限，使用流式解码")
+        return None
+
+    raw_file = f'{key}.raw'
+    raw_path = os.path.join(cache_dir, raw_file)
+    tmp_path = raw_path + '.tmp'
+    frame_count = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if frame.shape != (height, width, 3):
+                    raise ValueError(f"视频帧尺寸不一致: {frame.shape}")
+                frame_count += 1
+                # 容器记录的帧数可能偏小，实际解码超过上限时同样放弃缓存
+                if frame_count * frame_bytes > max_bytes:
+                    raise OverflowError
+                f.write(frame.data)
+    except OverflowError:
+        os.remove(tmp_path)
+        logger.info("背景视频实际帧数超过缓存上限，使用流式解码")
+        return None
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cap.release()
+
+    if frame_count == 0:
+        os.remove(tmp_path)
+        logger.warning(f"背景视频没有可解码的帧: {input_video_path}")
+        return None
+
+    # 先写数据再写描述文件，描述文件存在即表示缓存完整
+    os.replace(tmp_path, raw_path)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'source': os.path.abspath(input_video_path),
+            'raw_file': raw_file,
+            'width': width,
+            'height': height,
+            'fps': fps,
+            'frame_count': frame_count,
+        }, f)
+    logger.info(f"背景视频已解码缓存: {frame_count} 帧，{frame_count * frame_bytes / 1024 ** 2:.0f} MB")
+    return meta_path
+
+def open_frame_cache(meta_path):
+    """打开解码缓存，同一进程内重复打开时返回同一个对象"""
+    with _open_caches_lock:
+        cache = _open_caches.get(meta_path)
+        if cache is None:
+            cache = FrameCache(meta_path)
+            _open_caches[meta_path] = cache
+        return cache
+
+def close_frame_cache(meta_path):
+    """释放当前进程对缓存文件的映射（Windows下删除文件前需要先释放）"""
+    with _open_caches_lock:
+        cache = _open_caches.pop(meta_path, None)
+    if cache is not None:
+        # 没有其它引用后 numpy 会关闭映射
+        cache.frames = None
@@ -0,0 +1,202 @@
+import time
+import queue
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_DONE = object()
+
+class _Stopped(Exception):
+    """其它阶段出错，流水线提前结束"""
+
+class PipelineStats:
+    """
+    流水线各阶段的统计，用于调整批大小和合成线程数
+
+    queue_depth: 每次放入后队列中的批数（次数、平均、最大）。decoded 长期接近上限说明合成是瓶颈，
+                 composited 长期接近上限说明编码是瓶颈。
+    stage_wait: 各阶段等待输入或输出的总秒数，等待越多说明该阶段越空闲。
+    """
+    def __init__(self, queue_names):
+        self._lock = threading.Lock()
+        self._depth = {name: [0, 0, 0] for name in queue_names}  # [采样次数, 深度总和, 最大深度]
+        self._wait = {}
+
+    def sample(self, name, depth):
+        with self._lock:
+            record = self._depth[name]
+            record[0] += 1
+            record[1] += depth
+            record[2] = max(record[2], depth)
+
+    def add_wait(self, stage, seconds):
+        with self._lock:
+            self._wait[stage] = self._wait.get(stage, 0) + seconds
+
+    def summary(self):
+        with self._lock:
+            return {
+                'queue_depth': {
+                    name: {'samples': count, 'avg': total / count if count else 0, 'max': peak}
+                    for name, (count, total, peak) in self._depth.items()
+                },
+                'stage_wait': dict(self._wait),
+            }
+
+def format_pipeline_stats(summary):
+    """把 PipelineStats.summary() 格式化为一行日志"""
+    depth = '，'.join(
+        f"{name} 平均{item['avg']:.1f}/最大{item['max']}"
+        for name, item in summary['queue_depth'].items()
+    )
+    wait = '，'.join(f"{stage} {seconds:.2f}秒" for stage, seconds in summary['stage_wait'].items())
+    return f"队列深度: {depth}；阶段等待: {wait}"
+
+def run_frame_pipeline(
+    read_batch,
+    process_batch,
+    write_frame,
+    total_frames,
+    frame_shape,
+    batch_size,
+    workers=1,
+    progress_callback=None
+    ):
+    """
+    解码 → 合成 → 编码 三段流水线
+
+    解码线程把帧读入空闲的批缓冲区，合成线程原地处理，编码线程按原顺序写出后归还缓冲区。
+    缓冲区总数固定为 workers+2，队列有界，某一阶段变慢时上游会阻塞等待（背压），
+    内存占用不会随视频长度增长。cv2.VideoWriter 和ffmpeg管道写入器都只在编码线程中调用。
+
+    参数:
+        read_batch: read_batch(缓冲区, 起始帧偏移, 帧数)，读入帧并返回实际读到的帧数（不足表示背景已读完）
+        process_batch: process_batch(帧数组)，原地处理一批帧，可在多个线程中同时调用
+        write_frame: write_frame(帧)，写出一帧
+        total_frames: 需要处理的总帧数
+        frame_shape: 单帧形状 (高, 宽, 3)
+        batch_size: 每批帧数
+        workers: 合成线程数
+        progress_callback: 可选，回调 progress_callback(已写出帧数, 总帧数)
+    返回:
+        (已写出帧数, PipelineStats.summary())
+    """
+    workers = max(1, int(workers))
+    pool_size = workers + 2
+    free = queue.Queue()
+    for _ in range(pool_size):
+        free.put(np.empty((batch_size,) + tuple(frame_shape), dtype=np.uint8))
+    decoded = queue.Queue(maxsize=pool_size)
+    composited = queue.Queue(maxsize=pool_size)
+    queues = {'decoded': decoded, 'composited': composited}
+    stats = PipelineStats(queues)
+    stop = threading.Event()
+    errors = []
+    written = [0]
+
+    def fail(error):
+        errors.append(error)
+        stop.set()
+
+    def get(q, stage):
+        start = time.perf_counter()
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if stop.is_set():
+                    raise _Stopped
+        stats.add_wait(stage, time.perf_counter() - start)
+        return item
+
+    def put(name, item, stage):
+        q = queues[name]
+        start = time.perf_counter()
+        while True:
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if stop.is_set():
+                    raise _Stopped
+        stats.add_wait(stage, time.perf_counter() - start)
+        if item is not _DONE:
+            stats.sample(name, q.qsize())
+
+    def decode():
+        try:
+            seq = 0
+            offset = 0
+            while offset < total_frames:
+                buf = get(free, 'decode')
+                count = min(batch_size, total_frames - offset)
+                read = read_batch(buf, offset, count)
+                if read > 0:
+                    put('decoded', (seq, buf, read), 'decode')
+                    seq += 1
+                    offset += read
+                if read < count:
+                    logger.warning(f"背景帧提前读完，只读取到 {offset}/{total_frames} 帧")
+                    break
+            for _ in range(workers):
+                put('decoded', _DONE, 'decode')
+        except _Stopped:
+            pass
+        except Exception as e:
+            fail(e)
+
+    def composite():
+        try:
+            while True:
+                item = get(decoded, 'composite')
+                if item is _DONE:
+                    break
+                _, buf, count = item
+                process_batch(buf[:count])
+                put('composited', item, 'composite')
+            put('composited', _DONE, 'composite')
+        except _Stopped:
+            pass
+        except Exception as e:
+            fail(e)
+
+    def encode():
+        try:
+            finished = 0
+            pending = {}
+            next_seq = 0
+            while finished < workers:
+                item = get(composited, 'encode')
+                if item is _DONE:
+                    finished += 1
+                    continue
+                # 多个合成线程可能乱序完成，按序号重排后写出
+                pending[item[0]] = item
+                while next_seq in pending:
+                    _, buf, count = pending.pop(next_seq)
+                    for frame in buf[:count]:
+                        write_frame(frame)
+                    written[0] += count
+                    next_seq += 1
+                    free.put(buf)
+                    if progress_callback:
+                        progress_callback(written[0], total_frames)
+        except _Stopped:
+            pass
+        except Exception as e:
+            fail(e)
+
+    threads = [threading.Thread(target=decode, name='pipeline-decode', daemon=True)]
+    threads += [threading.Thread(target=composite, name=f'pipeline-composite-{i}', daemon=True) for i in range(workers)]
+    threads.append(threading.Thread(target=encode, name='pipeline-encode', daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return written[0], stats.summary()
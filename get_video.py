@@ -6,6 +6,13 @@ import uuid
 import os
 import logging
 from make_image import *
+from video_encoder import open_video_writer, ffmpeg_encoder_args, DEFAULT_ENCODER_OPTIONS
+from frame_cache import open_frame_cache, is_still_image, read_still_frame
+from frame_pipeline import run_frame_pipeline, format_pipeline_stats
+from keyframe_index import IndexedVideoReader, seek_frame
+from segment_cache import fetch_segment, store_segment
+from tts_cache import TTS_CACHE_DIR, tts_key, fetch_tts, store_tts
+from audio_engine import TAIL_SILENCE, process_clip
 
 # 配置基本的日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -28,121 +35,144 @@ def get_mp3_length(file_path):
         logger.warning(f"文件不存在: {file_path}")
         return 0
 
-def split_audio(input_file, output_file, ffmpeg_path):
-    """去除音频前后的静音"""
+# 去除音频前后静音的滤镜：去掉开头的静音，反转后再去一次（即去掉结尾），最后反转回来
+SILENCE_TRIM_FILTER = (
+    'silenceremove=start_periods=1:start_duration=0:start_threshold=-50dB:detection=peak,areverse,'
+    'silenceremove=start_periods=1:start_duration=0:start_threshold=-50dB:detection=peak,areverse'
+)
+def encode_audio_clip(input_file, output_file, ffmpeg_path, trim_silence=True, tail_silence=TAIL_SILENCE):
+    """
+    一次ffmpeg调用完成单句语音的后处理：解码（任意格式）、去除前后静音、结尾补静音、编码为44.1kHz立体声MP3
+    
+    时长取自同一次调用的 -progress 输出（最后写出的时间点），与解码后的实际采样数一致，不必再读取文件。
+    
+    参数:
+        input_file: TTS服务返回的音频（mp3/wav均可）
+        output_file: 输出MP3路径
+        trim_silence: 是否去除前后静音
+        tail_silence: 结尾补充的静音时长（秒）
+    返回:
+        输出音频时长（秒）
+    """
+    filters = [SILENCE_TRIM_FILTER] if trim_silence else []
+    filters.append(f'apad=pad_dur={tail_silence}')
     cmd = [
         ffmpeg_path,
+        '-y',
         '-hide_banner',
-        '-loglevel', 'warning',
+        '-loglevel', 'error',
+        '-nostats',
+        '-progress', 'pipe:1',
         '-i', input_file,
-        '-filter_complex',
-        'silenceremove=start_periods=1:start_duration=0:start_threshold=-50dB:detection=peak,areverse,silenceremove=start_periods=1:start_duration=0:start_threshold=-50dB:detection=peak,areverse',
+        '-af', ','.join(filters),
         '-ar', '44100',
         '-ac', '2',
-        output_file,
-        '-y'
+        output_file
     ]
-    try:
-        subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
-        logger.error(f"音频分割失败: {e}")
-        # 如果分割失败，复制原文件作为输出
-        if os.path.exists(input_file):
-            import shutil
-            shutil.copy(input_file, output_file)
+    result = subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    duration = None
+    for line in result.stdout.decode('utf-8', errors='ignore').splitlines():
+        if line.startswith('out_time_us='):
+            try:
+                duration = int(line.split('=', 1)[1]) / 1e6
+            except ValueError:
+                pass
+    if duration is None:
+        # 老版本ffmpeg没有 out_time_us 时读取文件时长
+        return get_mp3_length(output_file)
+    return duration
 
 def process_audio_file(input_file, output_file, ffmpeg_path, task_id, cleanup=True):
-    """处理音频文件的通用方法"""
-    idx = str(uuid.uuid4())
-    temp_file = f"./cache/{task_id}/gga{idx}.mp3"
+    """
+    处理音频文件的通用方法（去除前后静音并补充结尾静音），返回输出音频时长
     
+    output_file 为 .wav 时在进程内用numpy处理（见 audio_engine.process_clip），不编码；
+    否则由一次ffmpeg调用处理并编码为MP3。
+    """
     try:
-        # 分割音频
-        split_audio(input_file, temp_file, ffmpeg_path)
-        
-        # 添加静音尾部
-        cmd = [
-            ffmpeg_path, "-y", "-i", os.path.abspath(temp_file), "-f", "lavfi", "-t", '0.3',
-            "-i", "anullsrc=r=44100:cl=stereo", 
-            "-filter_complex", "[0][1]concat=n=2:v=0:a=1[out]", 
-            "-map", "[out]", output_file
-        ]
-        subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
-        if cleanup and os.path.exists(temp_file):
-            os.remove(temp_file)
-            
-        return get_mp3_length(output_file)
+        if output_file.lower().endswith('.wav'):
+            return process_clip(input_file, output_file, ffmpeg_path)
+        try:
+            return encode_audio_clip(input_file, output_file, ffmpeg_path)
+        except subprocess.CalledProcessError as e:
+            # 去静音失败时只补充结尾静音
+            logger.error(f"音频分割失败: {e}")
+            return encode_audio_clip(input_file, output_file, ffmpeg_path, trim_silence=False)
     except Exception as e:
         logger.error(f"处理音频失败: {e}")
-        if os.path.exists(input_file) and not os.path.exists(output_file):
-            import shutil
-            shutil.copy(input_file, output_file)
         return get_mp3_length(output_file)
     finally:
         # 清理临时文件
-        if cleanup:
-            if os.path.exists(input_file):
-                os.remove(input_file)
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+        if cleanup and os.path.exists(input_file):
+            os.remove(input_file)
 
-async def generate_audio_useEdgeTTS(text, output_path, ffmpeg_path, task_id):
-    """使用EdgeTTS生成音频"""
+async def generate_audio_useEdgeTTS(text, output_path, ffmpeg_path, task_id, tts_cache_dir=TTS_CACHE_DIR):
+    """使用EdgeTTS生成音频（tts_cache_dir 为语音缓存目录，None 表示不使用缓存，下同）"""
+    key = tts_key('edge', text, voice=EDGE_VOICE)
+    duration = fetch_tts(tts_cache_dir, key, output_path)
+    if duration is not None:
+        return duration
     idx = str(uuid.uuid4())
     temp_wav = f"./cache/{task_id}/{idx}.wav"
-    temp_mp3 = f"./cache/{task_id}/ggb{idx}.mp3"
     
     try:
         # 生成WAV文件
-        await edgeTTS(text, 'zh-CN-XiaoxiaoNeural', temp_wav)
-        
-        # 转换为MP3
-        cmd = [ffmpeg_path, "-y", "-i", temp_wav, temp_mp3]
-        subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        await edgeTTS(text, EDGE_VOICE, temp_wav)
         
-        # 处理音频
-        return process_audio_file(temp_mp3, output_path, ffmpeg_path, task_id)
+        # 处理音频（直接解码WAV，转码与去静音在同一次ffmpeg调用中完成）
+        duration = process_audio_file(temp_wav, output_path, ffmpeg_path, task_id)
+        store_tts(tts_cache_dir, key, output_path, duration)
+        return duration
     except Exception as e:
         logger.error(f"EdgeTTS音频生成失败: {e}")
         return 0
 
-def generate_audio_useZureAPI(task_id, text, reg, apikey, ffmpeg_path, output_path, voice):
+def generate_audio_useZureAPI(task_id, text, reg, apikey, ffmpeg_path, output_path, voice, tts_cache_dir=TTS_CACHE_DIR):
     """使用Azure API生成音频"""
+    key = tts_key('azure', text, voice=voice)
+    duration = fetch_tts(tts_cache_dir, key, output_path)
+    if duration is not None:
+        return duration
     idx = str(uuid.uuid4())
     temp_mp3 = f"./cache/{task_id}/ggb{idx}.mp3"
     
     try:
         azureTTS(apikey=apikey, text=text, voice=voice, reg=reg, output_path=temp_mp3)
-        return process_audio_file(temp_mp3, output_path, ffmpeg_path, task_id)
+        duration = process_audio_file(temp_mp3, output_path, ffmpeg_path, task_id)
+        store_tts(tts_cache_dir, key, output_path, duration)
+        return duration
     except Exception as e:
         logger.error(f"Azure API调用失败: {e}")
         return 0
 
-def generate_audio_useAliAPI(task_id, text, ffmpeg_path, output_path):
+def generate_audio_useAliAPI(task_id, text, ffmpeg_path, output_path, tts_cache_dir=TTS_CACHE_DIR):
     """使用阿里云API生成音频"""
+    key = tts_key('ali', text, voice=ALI_VOICE)
+    duration = fetch_tts(tts_cache_dir, key, output_path)
+    if duration is not None:
+        return duration
     idx = str(uuid.uuid4())
     temp_wav = f"./cache/{task_id}/{idx}.wav"
-    temp_mp3 = f"./cache/{task_id}/ggb{idx}.mp3"
     
     try:
-        aliTTS(text=text, output_path=temp_wav)
-        
-        # 转换为MP3
-        cmd = [ffmpeg_path, "-y", "-i", temp_wav, temp_mp3]
-        subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        aliTTS(text=text, voice=ALI_VOICE, output_path=temp_wav)
         
-        # 处理音频
-        return process_audio_file(temp_mp3, output_path, ffmpeg_path, task_id)
+        # 处理音频（直接解码WAV，转码与去静音在同一次ffmpeg调用中完成）
+        duration = process_audio_file(temp_wav, output_path, ffmpeg_path, task_id)
+        store_tts(tts_cache_dir, key, output_path, duration)
+        return duration
     except Exception as e:
         logger.error(f"阿里云API调用失败: {e}")
         return 0
 
-def generate_audio_useXtts(text, output_path, ffmpeg_path, task_id):
+def generate_audio_useXtts(text, output_path, ffmpeg_path, task_id, tts_cache_dir=TTS_CACHE_DIR):
     """使用XTTS生成音频"""
+    key = tts_key('xtts', text)
+    duration = fetch_tts(tts_cache_dir, key, output_path)
+    if duration is not None:
+        return duration
     idx = str(uuid.uuid4())
     temp_wav = f"./cache/{task_id}/{idx}.wav"
-    temp_mp3 = f"./cache/{task_id}/ggb{idx}.mp3"
     
     try:
         # 这里XTTS实现被注释了，保持原样
@@ -151,43 +181,123 @@ def generate_audio_useXtts(text, output_path, ffmpeg_path, task_id):
         
         # 如果XTTS实现，则处理以下代码
         if os.path.exists(temp_wav):
-            # 转换为MP3
-            cmd = [ffmpeg_path, "-y", "-i", temp_wav, temp_mp3]
-            subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            
             # 处理音频
-            return process_audio_file(temp_mp3, output_path, ffmpeg_path, task_id)
+            duration = process_audio_file(temp_wav, output_path, ffmpeg_path, task_id)
+            store_tts(tts_cache_dir, key, output_path, duration)
+            return duration
         return 0
     except Exception as e:
         logger.error(f"XTTS调用失败: {e}")
         return 0
 
-def generate_audio_useTencentAPI(text, output_path, ffmpeg_path, task_id):
+def generate_audio_useTencentAPI(
+    text,
+    output_path,
+    ffmpeg_path,
+    task_id,
+    voice_type=TENCENT_VOICE_TYPE,
+    speed=TENCENT_SPEED,
+    volume=TENCENT_VOLUME,
+    tts_cache_dir=TTS_CACHE_DIR
+    ):
     """使用腾讯云API生成音频"""
+    key = tts_key('tencent', text, voice=voice_type, speed=speed, volume=volume)
+    duration = fetch_tts(tts_cache_dir, key, output_path)
+    if duration is not None:
+        return duration
     idx = str(uuid.uuid4())
     temp_mp3 = f"./cache/{task_id}/{idx}.mp3"
-    temp_mp3_2 = f"./cache/{task_id}/ggb{idx}.mp3"
     
     try:
-        tencentTTS(text=text, output_path=temp_mp3)
-        
-        # 转换为标准格式
-        cmd = [ffmpeg_path, "-y", "-i", temp_mp3, temp_mp3_2]
-        subprocess.run(cmd, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        tencentTTS(text=text, output_path=temp_mp3, voice_type=voice_type, speed=speed, volume=volume)
         
-        # 处理音频，这里使用0.1秒而不是0.3秒的静音
-        process_result = process_audio_file(temp_mp3_2, output_path, ffmpeg_path, task_id, cleanup=False)
+        # 处理音频：转换格式、去除前后静音、补充结尾静音在同一次ffmpeg调用中完成，处理后删除临时文件
+        process_result = process_audio_file(temp_mp3, output_path, ffmpeg_path, task_id)
         
-        # 清理临时文件
-        for file in [temp_mp3, temp_mp3_2]:
-            if os.path.exists(file):
-                os.remove(file)
-                
+        store_tts(tts_cache_dir, key, output_path, process_result)
         return process_result
     except Exception as e:
         logger.error(f"腾讯云API调用失败: {e}")
         return 0
 
+def time_to_frame(seconds, fps):
+    """时间换算为帧序号，容忍浮点误差（如 帧号/fps 换算回来仍是原帧号）"""
+    return int(seconds * fps + 1e-6)
+
+def probe_video(input_video_path):
+    """读取背景视频的宽、高、帧率和总帧数"""
+    cap = cv2.VideoCapture(input_video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"无法打开视频文件 {input_video_path}")
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+    return width, height, fps, total_frames
+
+def plan_segments(tmls, fps, workers, chunks_per_worker=4):
+    """
+    按预计帧数划分渲染任务
+    
+    单句字幕可能比其它句子长很多，按句子数量平均分配会让个别线程拖到最后。
+    这里以帧数为工作量，超过 总帧数/(并发数*chunks_per_worker) 的长句在帧边界处拆成多段，
+    配合共享任务队列（长任务优先）让所有工作线程/进程一直忙到最后。
+    
+    返回:
+        [(句子序号, 开始时间, 结束时间, 帧数), ...]，按时间线顺序，不含0帧的片段
+    """
+    bounds = [(time_to_frame(start_time, fps), time_to_frame(end_time, fps)) for start_time, end_time in tmls]
+    total_frames = sum(max(0, end - start) for start, end in bounds)
+    max_frames = max(1, -(-total_frames // max(1, workers * chunks_per_worker)))
+    
+    items = []
+    for idx, ((start_time, end_time), (start_frame, end_frame)) in enumerate(zip(tmls, bounds)):
+        frames = end_frame - start_frame
+        if frames <= 0:
+            continue
+        pieces = -(-frames // max_frames)
+        edges = [start_frame + frames * k // pieces for k in range(pieces + 1)]
+        for k in range(pieces):
+            # 首尾使用原始时间，中间的拆分点对齐到帧边界
+            piece_start = start_time if k == 0 else edges[k] / fps
+            piece_end = end_time if k == pieces - 1 else edges[k + 1] / fps
+            items.append((idx, piece_start, piece_end, edges[k + 1] - edges[k]))
+    return items
+
+# 批量处理时帧缓冲区的默认内存预算（字节，每个渲染任务各自占用），1080p单合成线程时每批约6帧
+DEFAULT_BATCH_MEMORY = 128 * 1024 ** 2
+
+def batch_size_for_budget(width, height, batch_memory=DEFAULT_BATCH_MEMORY, max_frames=None, band_size=None, pipeline_workers=1):
+    """
+    根据内存预算计算每批处理的帧数
+    
+    流水线共有 pipeline_workers+2 个批缓冲区，每帧各占一帧BGR数据；每个合成线程另有一块
+    合成用的uint16中间缓冲区，只覆盖字幕横条。band_size 为横条的 (宽, 高)，为None时按横条占满整帧计算。
+    """
+    band_width, band_height = band_size if band_size is not None else (width, height)
+    frame_bytes = width * height * 3 * (pipeline_workers + 2) + band_width * band_height * 3 * 2 * pipeline_workers
+    batch_size = max(1, int(batch_memory) // max(1, frame_bytes))
+    if max_frames is not None:
+        batch_size = min(batch_size, max(1, max_frames))
+    return batch_size
+
+def read_frame_into(cap, frame):
+    """
+    把下一帧解码到预分配的 frame 中，返回是否读到
+    
+    解码出的帧与 frame 尺寸不同时（容器记录的尺寸不准、带旋转信息的视频等），OpenCV会另外分配数组而不是写入 frame，
+    这里检查返回的数组：尺寸相同则复制进来，尺寸不同则报错，避免缓冲区里留着上一批的旧帧。
+    """
+    ret, image = cap.read(frame)
+    if ret and not np.shares_memory(image, frame):
+        if image.shape != frame.shape:
+            raise ValueError(f"解码出的帧尺寸 {image.shape} 与视频属性 {frame.shape} 不一致")
+        np.copyto(frame, image)
+    return ret
+
 def create_video(
     input_video_path,
     output_video_path,
@@ -198,90 +308,374 @@ def create_video(
     chinese_text_size=10,
     chinese_text_color=(0,0,0),
     chinese_text_posotion=1.75,
-    line_spacing=1.5
+    line_spacing=1.5,
+    blur_mode='quality',
+    compose_mode='numpy',
+    encoder='cv2',
+    ffmpeg_path=None,
+    encoder_options=None,
+    frame_cache_path=None,
+    still_image=None,
+    batch_memory=DEFAULT_BATCH_MEMORY,
+    pipeline_workers=1,
+    keyframe_index=None
     ):
-    """处理视频的每一帧，添加文字和模糊背景"""
-    logger.info(f"处理文字：{chinese_text[:20]}... 时间：{start_time}-{end_time}")
+    """
+    处理视频的每一帧，添加文字和模糊背景
     
-    # 打开输入视频
-    cap = cv2.VideoCapture(input_video_path)
-    if not cap.isOpened():
-        raise FileNotFoundError(f"无法打开视频文件 {input_video_path}")
+    frame_cache_path 为 frame_cache.build_frame_cache 的返回值时，直接从解码缓存读取背景帧，
+    不再打开背景视频解码；为None时按原方式流式解码。
+    still_image 为None时自动判断背景是否为静态图片，静态背景交给 create_still_video 处理。
+    batch_memory 为帧缓冲区的内存预算（字节），决定每批解码、合成的帧数。
     
-    # 获取视频属性
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    video_duration = total_frames / fps  # 视频总时长（秒）
+    解码、合成、编码在 frame_pipeline 的三段流水线中并行，pipeline_workers 为合成线程数。
+    keyframe_index 为 keyframe_index.load_keyframe_index 的返回值时，以其中的帧数为背景长度，
+    并由ffmpeg（需提供 ffmpeg_path）从开始帧之前最近的关键帧解码，循环播放时同样按索引回到开头。
     
-    # 处理开始时间（如果大于视频长度则取模）
-    if start_time > video_duration:
-        start_time = start_time % video_duration
-        logger.warning(f"开始时间超过视频长度，使用取模后的时间 {start_time} 秒")
+    返回:
+        流水线统计（见 frame_pipeline.PipelineStats.summary），静态背景时为None
+    """
+    if still_image is None:
+        still_image = is_still_image(input_video_path)
+    if still_image:
+        return create_still_video(
+            input_video_path,
+            output_video_path,
+            chinese_text,
+            font_path_chinese,
+            start_time,
+            end_time,
+            chinese_text_size,
+            chinese_text_color,
+            chinese_text_posotion,
+            line_spacing,
+            blur_mode,
+            compose_mode,
+            encoder,
+            ffmpeg_path,
+            encoder_options
+        )
     
-    # 计算开始和结束帧
-    start_frame = int(start_time * fps)
-    if end_time is not None:
-        if end_time > video_duration:
-            end_time = end_time % video_duration
-            logger.warning(f"结束时间超过视频长度，使用取模后的时间 {end_time} 秒")
-        end_frame = int(end_time * fps)
+    logger.info(f"处理文字：{chinese_text[:20]}... 时间：{start_time}-{end_time}")
+    
+    if frame_cache_path:
+        # 从解码缓存读取背景帧
+        cache = open_frame_cache(frame_cache_path)
+        cap = None
+        width, height, fps, total_frames = cache.width, cache.height, cache.fps, cache.frame_count
     else:
-        end_frame = total_frames
+        # 打开输入视频
+        cache = None
+        cap = cv2.VideoCapture(input_video_path)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"无法打开视频文件 {input_video_path}")
         
-    # 计算需要处理的总帧数
-    if start_frame > end_frame:
-        target_frames = total_frames - start_frame + end_frame
-    else:
-        target_frames = end_frame - start_frame
+        # 获取视频属性
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if keyframe_index:
+            # 容器记录的帧数可能不准，以数据包统计的帧数为准
+            total_frames = keyframe_index['frame_count']
+            if ffmpeg_path:
+                cap.release()
+                cap = IndexedVideoReader(ffmpeg_path, input_video_path, keyframe_index, (width, height))
+    
+    # 计算需要处理的总帧数（按取模前的时间计算，片段比背景视频长时也能得到正确帧数）
+    start_frame = time_to_frame(start_time, fps)
+    if end_time is not None:
+        target_frames = max(0, time_to_frame(end_time, fps) - start_frame)
+    
+    # 处理开始帧（如果超过视频长度则取模）
+    if start_frame >= total_frames:
+        start_frame = start_frame % total_frames
+        logger.warning(f"开始时间超过视频长度，使用取模后的时间 {start_frame / fps:.2f} 秒")
+    if end_time is None:
+        target_frames = total_frames - start_frame
     
     # 设置开始帧
-    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    if cap is not None:
+        seek_frame(cap, start_frame)
+    
+    # 字幕在同一句内不变，只需预渲染一次
+    overlay = get_subtitle_overlay(
+        width,
+        height,
+        chinese_text,
+        font_path_chinese,
+        chinese_text_size,
+        chinese_text_color,
+        chinese_text_posotion,
+        line_spacing
+    )
+    
+    # 批缓冲区和各合成线程的横条中间缓冲区共用内存预算
+    pipeline_workers = max(1, int(pipeline_workers))
+    band_height, band_width = overlay.premultiplied.shape[:2]
+    batch_size = batch_size_for_budget(width, height, batch_memory, target_frames, (band_width, band_height), pipeline_workers)
     
     # 创建视频写入器
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
+    out = open_video_writer(output_video_path, fps, (width, height), encoder, ffmpeg_path, encoder_options)
+    
+    # 解码线程：把一批帧读入缓冲区（缓存中的帧只读，同样复制到缓冲区）
+    def read_batch(frames, offset, count):
+        for i in range(count):
+            if cache is not None:
+                cache.read(start_frame + offset + i, frames[i])
+                continue
+            if not read_frame_into(cap, frames[i]):
+                # 如果到达视频末尾，重新开始
+                seek_frame(cap, 0)
+                if not read_frame_into(cap, frames[i]):
+                    return i
+        return count
+    
+    # 合成线程：整批模糊并叠加字幕
+    def process_batch(frames):
+        apply_subtitle_overlay_batch(frames, overlay, blur_mode, compose_mode)
+    
+    # 每处理约10%的帧显示一次进度
+    log_interval = max(1, target_frames // 10)
+    logged = [0]
+    def on_progress(done, total):
+        if done // log_interval > logged[0] // log_interval or done == total:
+            logger.info(f"视频处理进度: {done / total * 100:.1f}% ({done}/{total})")
+        logged[0] = done
+    
+    try:
+        _, stats = run_frame_pipeline(
+            read_batch,
+            process_batch,
+            out.write,
+            target_frames,
+            (height, width, 3),
+            batch_size,
+            pipeline_workers,
+            on_progress
+        )
+        logger.info(f"流水线统计 {os.path.basename(output_video_path)} - {format_pipeline_stats(stats)}")
+    finally:
+        # 释放资源
+        if cap is not None:
+            cap.release()
+        out.release()
+            
+    logger.info(f"视频处理完成: {output_video_path}")
+    return stats
+
+def create_still_video(
+    input_video_path,
+    output_video_path,
+    chinese_text,
+    font_path_chinese,
+    start_time,
+    end_time,
+    chinese_text_size=10,
+    chinese_text_color=(0,0,0),
+    chinese_text_posotion=1.75,
+    line_spacing=1.5,
+    blur_mode='quality',
+    compose_mode='numpy',
+    encoder='cv2',
+    ffmpeg_path=None,
+    encoder_options=None
+    ):
+    """
+    静态背景图片：整句只合成一帧，再重复输出到指定时长
+    
+    有ffmpeg时把合成好的帧保存为PNG，用 -loop 1 交给ffmpeg编码，Python不再逐帧处理；
+    否则把同一帧重复写入 cv2.VideoWriter。
+    """
+    logger.info(f"处理文字：{chinese_text[:20]}... 时间：{start_time}-{end_time}（静态背景）")
+    frame, fps = read_still_frame(input_video_path)
+    height, width = frame.shape[:2]
+    target_frames = max(0, time_to_frame(end_time, fps) - time_to_frame(start_time, fps))
+    
+    overlay = get_subtitle_overlay(
+        width,
+        height,
+        chinese_text,
+        font_path_chinese,
+        chinese_text_size,
+        chinese_text_color,
+        chinese_text_posotion,
+        line_spacing
+    )
+    frame = apply_subtitle_overlay(frame, overlay, blur_mode, compose_mode)
+    
+    if encoder == 'ffmpeg' and ffmpeg_path:
+        still_path = os.path.splitext(output_video_path)[0] + '_still.png'
+        # imencode + tofile 支持中文路径
+        cv2.imencode('.png', frame)[1].tofile(still_path)
+        cmd = [
+            ffmpeg_path,
+            '-y',
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-loop', '1',
+            '-framerate', str(fps),
+            '-i', still_path,
+            '-frames:v', str(target_frames),
+            '-an',
+        ]
+        cmd += ffmpeg_encoder_args(encoder_options)
+        if (encoder_options or {}).get('codec', DEFAULT_ENCODER_OPTIONS['codec']) == 'libx264':
+            cmd += ['-tune', 'stillimage']
+        cmd.append(output_video_path)
+        try:
+            result = subprocess.run(cmd, capture_output=True, startupinfo=startupinfo)
+        finally:
+            os.remove(still_path)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg编码失败: {output_video_path} {result.stderr.decode('utf-8', errors='ignore').strip()}")
+    else:
+        out = open_video_writer(output_video_path, fps, (width, height), encoder, ffmpeg_path, encoder_options)
+        try:
+            for _ in range(target_frames):
+                out.write(frame)
+        finally:
+            out.release()
+    
+    logger.info(f"视频处理完成: {output_video_path}（{target_frames} 帧）")
+
+def init_render_worker(font_path_chinese, font_size_chinese, atlas_text=''):
+    """渲染进程池的初始化函数：每个工作进程只加载一次字体，并为 atlas_text 中的字符建立字形集合"""
+    get_glyph_atlas(font_path_chinese, font_size_chinese).add(atlas_text)
+
+def render_segment(conf):
+    """
+    渲染进程池的任务函数，参数同 create_video，返回输出文件路径
+    
+    conf 中带有 segment_cache_dir 和 segment_key（见 segment_cache.segment_key）时，
+    先查找已渲染的相同片段，未命中则渲染后存入缓存。
+    """
+    conf = dict(conf)
+    cache_dir = conf.pop('segment_cache_dir', None)
+    key = conf.pop('segment_key', None)
+    output_path = conf['output_video_path']
+    if cache_dir and key and fetch_segment(cache_dir, key, output_path):
+        return output_path
+    create_video(**conf)
+    if cache_dir and key:
+        try:
+            store_segment(cache_dir, key, output_path)
+        except OSError as e:
+            logger.warning(f"保存片段缓存失败: {str(e)}")
+    return output_path
+
+def render_timeline(
+    input_video_path,
+    output_video_path,
+    sentences,
+    tmls,
+    font_path_chinese,
+    chinese_text_size=10,
+    chinese_text_color=(0,0,0),
+    chinese_text_posotion=1.75,
+    line_spacing=1.5,
+    blur_mode='quality',
+    compose_mode='numpy',
+    encoder='cv2',
+    ffmpeg_path=None,
+    encoder_options=None,
+    progress_callback=None,
+    frame_cache_path=None
+    ):
+    """
+    按时间线一次性渲染全部字幕，输出一个连续的视频
+    
+    背景视频只打开一次并顺序解码（不够长时循环播放），在帧边界处切换字幕，
+    避免逐句打开、定位、写出小片段再拼接。
+    
+    参数:
+        sentences: 字幕列表
+        tmls: 每句字幕的 [开始时间, 结束时间]，与sentences一一对应
+        encoder, ffmpeg_path, encoder_options: 视频写入方式，见 video_encoder.open_video_writer
+        progress_callback: 可选，回调 progress_callback(已处理帧数, 总帧数)
+        frame_cache_path: 可选，背景视频的解码缓存，背景循环播放时不必重复解码
+    
+    背景为静态图片时，每句字幕只合成一帧，之后重复写入该帧。
+    """
+    if len(sentences) != len(tmls):
+        raise ValueError(f"字幕数量({len(sentences)})与时间线数量({len(tmls)})不一致")
+    
+    still_frame = None
+    cache = None
+    cap = None
+    if is_still_image(input_video_path):
+        still_frame, fps = read_still_frame(input_video_path)
+        height, width = still_frame.shape[:2]
+    elif frame_cache_path:
+        cache = open_frame_cache(frame_cache_path)
+        width, height, fps = cache.width, cache.height, cache.fps
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+    else:
+        cap = cv2.VideoCapture(input_video_path)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"无法打开视频文件 {input_video_path}")
+        
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+    
+    # 每句字幕的结束帧（不含），按时间线换算到帧边界
+    end_frames = [time_to_frame(end_time, fps) for _, end_time in tmls]
+    target_frames = end_frames[-1] if end_frames else 0
+    logger.info(f"按时间线渲染 {len(sentences)} 句字幕，共 {target_frames} 帧")
+    
+    out = open_video_writer(output_video_path, fps, (width, height), encoder, ffmpeg_path, encoder_options)
     
     try:
         total_processed_frames = 0
-        # 每100帧显示一次进度
         log_interval = max(1, target_frames // 10)
         
-        while total_processed_frames < target_frames:
-            ret, frame = cap.read()
-            if not ret:
-                # 如果到达视频末尾，重新开始
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-            # 处理当前帧
-            processed_frame = create_static_text_image(
-                frame,
-                chinese_text,
+        for idx, sentence in enumerate(sentences):
+            if total_processed_frames >= end_frames[idx]:
+                continue
+            # 当前句字幕只预渲染一次
+            overlay = get_subtitle_overlay(
+                width,
+                height,
+                sentence,
                 font_path_chinese,
                 chinese_text_size,
                 chinese_text_color,
                 chinese_text_posotion,
                 line_spacing
             )
+            if still_frame is not None:
+                # 静态背景每句只合成一次
+                still_composed = apply_subtitle_overlay(still_frame.copy(), overlay, blur_mode, compose_mode)
             
-            # 写入处理后的帧
-            out.write(processed_frame)
-            total_processed_frames += 1
-            
-            # 定期显示进度
-            if total_processed_frames % log_interval == 0 or total_processed_frames == target_frames:
-                progress = (total_processed_frames / target_frames) * 100
-                logger.info(f"视频处理进度: {progress:.1f}% ({total_processed_frames}/{target_frames})")
-            
+            while total_processed_frames < end_frames[idx]:
+                if still_frame is not None:
+                    frame = still_composed
+                elif cache is not None:
+                    cache.read(total_processed_frames, frame)
+                else:
+                    ret, frame = cap.read()
+                    if not ret:
+                        # 背景视频播放完毕，从头循环
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        ret, frame = cap.read()
+                        if not ret:
+                            raise ValueError(f"无法读取视频帧 {input_video_path}")
+                
+                if still_frame is None:
+                    frame = apply_subtitle_overlay(frame, overlay, blur_mode, compose_mode)
+                out.write(frame)
+                total_processed_frames += 1
+                
+                if total_processed_frames % log_interval == 0 or total_processed_frames == target_frames:
+                    logger.info(f"视频处理进度: {total_processed_frames / target_frames * 100:.1f}% ({total_processed_frames}/{target_frames})")
+                    if progress_callback:
+                        progress_callback(total_processed_frames, target_frames)
     finally:
-        # 释放资源
-        cap.release()
+        if cap is not None:
+            cap.release()
         out.release()
-            
+    
     logger.info(f"视频处理完成: {output_video_path}")
 
 def replace_prohibited_words(text, file_path):
@@ -0,0 +1,244 @@
+import os
+import json
+import bisect
+import logging
+import tempfile
+import subprocess
+from functools import lru_cache
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# 配置subprocess启动信息以隐藏窗口
+startupinfo = subprocess.STARTUPINFO()
+startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+# 索引文件格式版本，格式变化时旧索引自动失效
+INDEX_VERSION = 2
+
+def ffprobe_path_for(ffmpeg_path):
+    """由ffmpeg路径推出同目录下的ffprobe路径（ffmpeg.exe -> ffprobe.exe）"""
+    if not ffmpeg_path:
+        return 'ffprobe'
+    directory, name = os.path.split(ffmpeg_path)
+    return os.path.join(directory, name.replace('ffmpeg', 'ffprobe'))
+
+def index_path_for(input_video_path):
+    """关键帧索引保存在视频文件旁边"""
+    return f"{input_video_path}.keyframes.json"
+
+def remove_keyframe_index(input_video_path):
+    """删除视频旁的关键帧索引，视频本身被删除时一并调用"""
+    index_path = index_path_for(input_video_path)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+def _probe_packets(input_video_path, ffprobe_path):
+    """用ffprobe列出视频流所有数据包的显示时间和关键帧标记"""
+    cmd = [
+        ffprobe_path,
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        input_video_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, startupinfo=startupinfo)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe读取数据包失败: {result.stderr.decode('utf-8', errors='ignore').strip()}")
+    packets = []
+    for line in result.stdout.decode('utf-8', errors='ignore').splitlines():
+        pts_time, _, flags = line.strip().partition(',')
+        try:
+            packets.append((float(pts_time), 'K' in flags))
+        except ValueError:
+            # 没有显示时间的数据包（pts_time为N/A）无法定位，跳过
+            continue
+    return packets
+
+def build_keyframe_index(input_video_path, ffprobe_path):
+    """
+    扫描背景视频的数据包，生成关键帧索引
+
+    数据包按解码顺序排列，按显示时间排序后的序号就是帧号，关键帧的帧号由此得到，
+    与逐帧解码时的计数一致。每个关键帧另记一个定位时间：取关键帧与下一帧显示时间的中点，
+    按该时间向前定位一定落在这个关键帧上，不受时间精度影响。
+
+    返回:
+        {'frame_count': 总帧数, 'keyframes': [关键帧帧号, ...]（升序）, 'seek_times': [定位时间（秒）, ...], ...}
+    """
+    packets = _probe_packets(input_video_path, ffprobe_path)
+    times = sorted(pts_time for pts_time, _ in packets)
+    keyframes = sorted({bisect.bisect_left(times, pts_time) for pts_time, is_key in packets if is_key})
+    seek_times = [
+        (times[frame] + times[frame + 1]) / 2 if frame + 1 < len(times) else times[frame]
+        for frame in keyframes
+    ]
+    stat = os.stat(input_video_path)
+    return {
+        'version': INDEX_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'frame_count': len(times),
+        'keyframes': keyframes,
+        'seek_times': seek_times,
+    }
+
+def load_keyframe_index(input_video_path, ffmpeg_path=None):
+    """
+    读取背景视频的关键帧索引，索引不存在或视频已变化时重新生成并保存
+
+    参数:
+        input_video_path: 背景视频路径
+        ffmpeg_path: ffmpeg路径，用于找到同目录的ffprobe
+    返回:
+        索引字典；ffprobe不可用或视频没有关键帧信息时返回None（退回OpenCV自带的定位）
+    """
+    index_path = index_path_for(input_video_path)
+    stat = os.stat(input_video_path)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if (index.get('version') == INDEX_VERSION
+                and index.get('size') == stat.st_size
+                and index.get('mtime_ns') == stat.st_mtime_ns):
+            return index
+    except (OSError, ValueError):
+        pass
+
+    try:
+        index = build_keyframe_index(input_video_path, ffprobe_path_for(ffmpeg_path))
+    except Exception as e:
+        logger.warning(f"生成关键帧索引失败，使用逐帧定位: {str(e)}")
+        return None
+    if not index['keyframes'] or index['keyframes'][0] != 0:
+        logger.warning(f"视频首帧不是关键帧，不使用关键帧索引: {input_video_path}")
+        return None
+
+    try:
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+    except OSError as e:
+        logger.warning(f"关键帧索引保存失败: {str(e)}")
+    logger.info(f"关键帧索引已生成: {index['frame_count']} 帧，{len(index['keyframes'])} 个关键帧")
+    return index
+
+@lru_cache(maxsize=None)
+def frame_passthrough_args(ffmpeg_path):
+    """
+    让ffmpeg按解码顺序原样输出每一帧的参数
+
+    输出rawvideo时ffmpeg默认按恒定帧率补帧、丢帧，可变帧率的视频输出帧数就和数据包数对不上。
+    ffmpeg 5.1起使用 -fps_mode，更早的版本使用 -vsync。
+    """
+    try:
+        result = subprocess.run([ffmpeg_path, '-hide_banner', '-h', 'long'], capture_output=True, startupinfo=startupinfo)
+        if b'-fps_mode' in result.stdout:
+            return ['-fps_mode', 'passthrough']
+    except OSError:
+        pass
+    return ['-vsync', 'passthrough']
+
+class IndexedVideoReader:
+    """
+    按关键帧索引定位的背景视频解码器，由ffmpeg解码为原始BGR帧后从管道读取
+
+    接口与 cv2.VideoCapture 的 read / release 一致。定位时从目标之前最近的关键帧开始解码
+    （按索引中的显示时间定位，不依赖帧率换算），再逐帧读到目标，帧号按显示顺序计数，
+    可变帧率、长GOP的视频也能准确落到目标帧。目标在当前位置之后且属于同一GOP时直接向前读取。
+    """
+    def __init__(self, ffmpeg_path, input_video_path, keyframe_index, size):
+        width, height = size
+        self.ffmpeg_path = ffmpeg_path
+        self.input_video_path = input_video_path
+        self.keyframes = keyframe_index['keyframes']
+        self.seek_times = keyframe_index['seek_times']
+        self.frame_bytes = width * height * 3
+        self.scratch = bytearray(self.frame_bytes)
+        self.process = None
+        self.stderr_file = None
+        self.position = 0
+
+    def _start(self, seek_time):
+        self._stop()
+        cmd = [
+            self.ffmpeg_path,
+            '-hide_banner',
+            '-loglevel', 'error',
+            # -ss 按文件中的实际显示时间定位，并从落到的关键帧开始输出，不丢弃之前的帧
+            '-seek_timestamp', '1',
+            '-noaccurate_seek',
+            '-ss', f'{seek_time:.6f}',
+            '-i', self.input_video_path,
+            '-an',
+        ]
+        # 每个数据包输出一帧，帧号与按数据包统计的索引一致
+        cmd += frame_passthrough_args(self.ffmpeg_path)
+        cmd += [
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            '-',
+        ]
+        self.stderr_file = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=self.stderr_file,
+            bufsize=self.frame_bytes,
+            startupinfo=startupinfo
+        )
+
+    def _stop(self):
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        self.stderr_file.close()
+        self.stderr_file = None
+
+    def _read_into(self, buffer):
+        if self.process is None:
+            self.seek(self.position)
+        if self.process.stdout.readinto(buffer) != self.frame_bytes:
+            if self.process.wait() != 0:
+                self.stderr_file.seek(0)
+                message = self.stderr_file.read().decode('utf-8', errors='ignore').strip()
+                logger.warning(f"ffmpeg解码背景视频失败: {self.input_video_path} {message}")
+            return False
+        self.position += 1
+        return True
+
+    def seek(self, target_frame):
+        """定位到 target_frame，下一次 read() 读到的就是该帧"""
+        k = max(0, bisect.bisect_right(self.keyframes, target_frame) - 1)
+        keyframe = self.keyframes[k]
+        if self.process is None or not keyframe <= self.position <= target_frame:
+            self._start(self.seek_times[k])
+            self.position = keyframe
+        while self.position < target_frame:
+            if not self._read_into(self.scratch):
+                break
+
+    def read(self, image):
+        """把下一帧读入 image（预分配的 (高, 宽, 3) uint8 数组）"""
+        if not self._read_into(memoryview(image).cast('B')):
+            return False, None
+        return True, image
+
+    def release(self):
+        self._stop()
+
+def seek_frame(cap, target_frame):
+    """
+    把 cap 定位到 target_frame，下一次 read() 读到的就是该帧
+
+    cap 为 IndexedVideoReader 时从最近的关键帧解码前进；cv2.VideoCapture 使用OpenCV自带的定位。
+    """
+    if isinstance(cap, IndexedVideoReader):
+        cap.seek(target_frame)
+    else:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
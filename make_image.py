@@ -1,93 +1,524 @@
 import cv2
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import os
+import math
 import numpy as np
 import subprocess
+import threading
+from functools import lru_cache
 
-def create_static_text_image(
-    frame,
+# 原实现对模糊区域连续做5次 GaussianBlur(radius=15)，等效于一次 sigma=15*sqrt(5) 的高斯模糊
+BLUR_SIGMA = 15 * 5 ** 0.5
+# 用三次均值模糊近似时的窗口宽度（三次宽度为w的均值模糊方差为 3*(w^2-1)/12）
+BLUR_BOX_WIDTH = int(round((4 * BLUR_SIGMA ** 2 + 1) ** 0.5)) | 1
+# 缩小模糊再放大时的缩放倍数
+BLUR_DOWNSCALE = 4
+
+def _blur_pil(band):
+    """原始实现：PIL连续5次高斯模糊（作为效果参照）"""
+    img = Image.fromarray(band)
+    for _ in range(5):
+        img = img.filter(ImageFilter.GaussianBlur(radius=15))
+    return np.asarray(img)
+
+def _blur_gaussian(band):
+    """OpenCV单次等效sigma高斯模糊"""
+    return cv2.GaussianBlur(band, (0, 0), BLUR_SIGMA, borderType=cv2.BORDER_REFLECT)
+
+def _blur_box(band):
+    """三次均值模糊近似高斯模糊，耗时与半径无关"""
+    for _ in range(3):
+        band = cv2.blur(band, (BLUR_BOX_WIDTH, BLUR_BOX_WIDTH), borderType=cv2.BORDER_REFLECT)
+    return band
+
+def _blur_downscale(band):
+    """先缩小再模糊最后放大，适合快速出片"""
+    height, width = band.shape[:2]
+    small = cv2.resize(
+        band,
+        (max(1, width // BLUR_DOWNSCALE), max(1, height // BLUR_DOWNSCALE)),
+        interpolation=cv2.INTER_AREA
+    )
+    small = cv2.GaussianBlur(small, (0, 0), BLUR_SIGMA / BLUR_DOWNSCALE, borderType=cv2.BORDER_REFLECT)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+# 可选的模糊实现
+BLUR_BACKENDS = {
+    'pil': _blur_pil,
+    'gaussian': _blur_gaussian,
+    'box': _blur_box,
+    'downscale': _blur_downscale,
+}
+# 质量模式与快速模式对应的模糊实现
+BLUR_MODES = {
+    'quality': 'box',
+    'fast': 'downscale',
+}
+
+def blur_band(band, blur_mode='quality'):
+    """
+    模糊字幕背景横条
+
+    参数:
+        band: 横条区域（numpy数组）
+        blur_mode: 'quality'、'fast' 或 BLUR_BACKENDS 中的实现名
+    """
+    backend = BLUR_BACKENDS.get(BLUR_MODES.get(blur_mode, blur_mode))
+    if backend is None:
+        raise ValueError(f"不支持的模糊模式: {blur_mode}")
+    return backend(band)
+
+# 进程内缓存的字体对象数量上限（按 字体路径+字号 区分）
+FONT_CACHE_SIZE = 32
+# 进程内缓存的换行结果数量上限（按 文本+字体+字号+最大宽度 区分）
+LAYOUT_CACHE_SIZE = 1024
+# 进程内缓存的字幕图层数量上限（每个图层约为 横条面积*12 字节）
+OVERLAY_CACHE_SIZE = 16
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def load_font(font_path, font_size):
+    """加载字体（带进程内LRU缓存）"""
+    return ImageFont.truetype(font_path, font_size)
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def wrap_text(text, font_path, font_size, max_width):
+    """
+    按最大宽度逐字换行（带进程内LRU缓存）
+
+    返回:
+        ((行文本, 行宽像素), ...)
+    """
+    font = load_font(font_path, font_size)
+    lines = []
+    current_line = []
+    current_width = 0
+    for char in text:
+        char_width = font.getlength(char)
+        if current_width + char_width > max_width:
+            lines.append(''.join(current_line))
+            current_line = [char]
+            current_width = char_width
+        else:
+            current_line.append(char)
+            current_width += char_width
+    lines.append(''.join(current_line))
+    return tuple((line, font.getlength(line)) for line in lines)
+
+def _blit_max(dst, src, x, y):
+    """把字形位图按最大值叠加到遮罩上（与PIL绘制文字时字形重叠部分的处理一致），超出遮罩的部分裁掉"""
+    height, width = dst.shape
+    src_height, src_width = src.shape
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + src_width), min(height, y + src_height)
+    if x1 <= x0 or y1 <= y0:
+        return
+    target = dst[y0:y1, x0:x1]
+    np.maximum(target, src[y0 - y:y1 - y, x0 - x:x1 - x], out=target)
+
+class GlyphAtlas:
+    """
+    同一字体、字号的字形位图集合
+
+    每个字符只由FreeType栅格化一次，之后排版时用numpy拼接位图。文字和阴影共用同一份遮罩，
+    颜色在合成图层时再套用，因此同一字体字号下不同颜色的字幕也共用一个字形集合。
+    """
+    def __init__(self, font_path, font_size):
+        self.font = load_font(font_path, font_size)
+        self._glyphs = {}
+        self._kernings = {}
+        self._lock = threading.Lock()
+
+    def add(self, text):
+        """栅格化text中尚未缓存的字符"""
+        missing = set(text) - self._glyphs.keys()
+        if not missing:
+            return
+        glyphs = {}
+        for char in missing:
+            x0, y0, x1, y1 = self.font.getbbox(char)
+            bitmap = None
+            if x1 > x0 and y1 > y0:
+                image = Image.new('L', (x1 - x0, y1 - y0), 0)
+                ImageDraw.Draw(image).text((-x0, -y0), char, font=self.font, fill=255)
+                bitmap = np.asarray(image)
+            # (位图, 相对笔位置的左上角偏移x, y, 前进宽度)
+            glyphs[char] = (bitmap, x0, y0, self.font.getlength(char))
+        with self._lock:
+            self._glyphs.update(glyphs)
+
+    def _kerning(self, left, right):
+        """字符对的字距调整（像素），与PIL整行排版时的结果一致"""
+        pair = left + right
+        kerning = self._kernings.get(pair)
+        if kerning is None:
+            kerning = self._kernings[pair] = self.font.getlength(pair) - self._glyphs[left][3] - self._glyphs[right][3]
+        return kerning
+
+    def render_line(self, mask, line, x, y):
+        """
+        在L遮罩（uint8数组）的 (x, y) 处绘制一行文字，坐标含义与 ImageDraw.text 相同
+
+        笔位置累加前进宽度和字距调整，按PIL的方式四舍五入到整像素。相邻字形的位图有重叠时
+        （如 ff、ffi），重叠部分的混合方式随PIL版本不同，这一行改由PIL整行绘制，结果与 ImageDraw.text 一致。
+        """
+        self.add(line)
+        placements = []
+        pen = 0.0
+        right = None
+        previous = None
+        for char in line:
+            if previous is not None:
+                pen += self._kerning(previous, char)
+            bitmap, offset_x, offset_y, advance = self._glyphs[char]
+            if bitmap is not None:
+                left = x + math.floor(pen + 0.5) + offset_x
+                if right is not None and left < right:
+                    self._render_line_pil(mask, line, x, y)
+                    return
+                placements.append((bitmap, left, y + offset_y))
+                right = left + bitmap.shape[1] if right is None else max(right, left + bitmap.shape[1])
+            pen += advance
+            previous = char
+        for bitmap, left, top in placements:
+            _blit_max(mask, bitmap, left, top)
+
+    def _render_line_pil(self, mask, line, x, y):
+        """用PIL绘制整行文字，再按最大值叠加到遮罩上"""
+        x0, y0, x1, y1 = self.font.getbbox(line)
+        if x1 <= x0 or y1 <= y0:
+            return
+        image = Image.new('L', (x1 - x0, y1 - y0), 0)
+        ImageDraw.Draw(image).text((-x0, -y0), line, font=self.font, fill=255)
+        _blit_max(mask, np.asarray(image), x + x0, y + y0)
+
+    def __len__(self):
+        return len(self._glyphs)
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_glyph_atlas(font_path, font_size):
+    """获取字体、字号对应的字形集合（带进程内LRU缓存）"""
+    return GlyphAtlas(font_path, font_size)
+
+def prepare_glyph_atlas(sentences, font_path_chinese, width, height, chinese_text_size=10):
+    """
+    提前为全部字幕中出现的字符建立字形集合，字号的计算与 layout_subtitle 一致
+
+    返回:
+        GlyphAtlas
+    """
+    atlas = get_glyph_atlas(font_path_chinese, min(width, height) // chinese_text_size)
+    atlas.add(''.join(sentences))
+    return atlas
+
+def text_cache_stats():
+    """字体缓存和换行缓存的命中统计"""
+    return {
+        'font': load_font.cache_info()._asdict(),
+        'layout': wrap_text.cache_info()._asdict(),
+        'glyph_atlas': get_glyph_atlas.cache_info()._asdict(),
+        'overlay': _cached_subtitle_overlay.cache_info()._asdict(),
+    }
+
+class SubtitleOverlay:
+    """
+    单句字幕的预渲染结果，同一句字幕的所有帧共用
+
+    属性:
+        width, height: 目标帧尺寸
+        layer: 与roi等大的RGBA文字图层（已包含阴影）
+        blur_area: 需要模糊的横条区域 (x0, y0, x1, y1)
+        roi: blur_area 限制在帧范围内的部分，逐帧处理只涉及这一区域
+        lines: 自动换行后的文本行
+        premultiplied: BGR顺序的 前景色*透明度（含四舍五入偏移），供numpy合成使用
+        inv_alpha: 255-透明度，供numpy合成使用
+    """
+    def __init__(self, width, height, layer, blur_area, lines):
+        self.width = width
+        self.height = height
+        self.layer = layer
+        self.blur_area = blur_area
+        self.roi = _clamp_area(blur_area, width, height)
+        self.lines = lines
+        rgba = np.asarray(layer, dtype=np.uint16)
+        alpha = rgba[..., 3:4]
+        self.premultiplied = rgba[..., 2::-1] * alpha + 127
+        self.inv_alpha = 255 - alpha
+        # 中间缓冲区按线程分开，同一个overlay可以在多个合成线程中同时使用
+        self._local = threading.local()
+
+    def scratch(self):
+        """合成时复用的中间缓冲区，避免每帧重新分配"""
+        buf = getattr(self._local, 'scratch', None)
+        if buf is None:
+            buf = self._local.scratch = np.empty(self.premultiplied.shape, dtype=np.uint16)
+        return buf
+
+    def batch_scratch(self, count):
+        """批量合成时复用的中间缓冲区，形状为 (count, 横条高, 横条宽, 3)"""
+        buf = getattr(self._local, 'batch_scratch', None)
+        if buf is None or len(buf) < count:
+            buf = self._local.batch_scratch = np.empty((count,) + self.premultiplied.shape, dtype=np.uint16)
+        return buf[:count]
+
+def layout_subtitle(
+    width,
+    height,
     chinese_text,
     font_path_chinese,
     chinese_text_size=10,
-    chinese_text_color=(0,0,0),
     chinese_text_posotion=1.75,
     line_spacing=1.5,
+    scale=1.0,
     ):
     """
-    直接在帧上添加文字和模糊背景
-    
+    计算字幕的排版（不绘制）
+
     参数:
-        frame: 输入的帧（numpy数组）
-        chinese_text: 要添加的中文文字
-        font_path_chinese: 中文字体路径
-        chinese_text_size: 文字大小
-        chinese_text_color: 文字颜色
-        chinese_text_posotion: 文字位置
-        line_spacing: 行间距
+        width, height: 目标帧尺寸
+        scale: 目标帧相对原视频的缩放比例（如低分辨率预览），横条上下留白按比例缩放
+        其余参数同 create_static_text_image
+    返回:
+        (字体对象, [(行文本, x, y), ...], 模糊区域blur_area)，x、y为每行文字左上角在帧中的坐标
     """
-    height, width = frame.shape[:2]
-    # 转换为PIL格式
-    pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-    draw = ImageDraw.Draw(pil_img)
     # 自动计算中文字体大小
     font_size_chinese = min(width, height) // chinese_text_size
-    font_chinese = ImageFont.truetype(font_path_chinese, font_size_chinese)
+    font_chinese = load_font(font_path_chinese, font_size_chinese)
     # 获取中文字体度量
     ascent_chinese, descent_chinese = font_chinese.getmetrics()
     base_line_height_chinese = ascent_chinese + descent_chinese  # 基础行高（无额外间距）
     actual_line_height_chinese = int(base_line_height_chinese * line_spacing)  # 实际行高（含间距）
-    
-    # 自动换行处理中文文本
+
+    # 自动换行处理中文文本（同一句字幕在预览、逐句渲染、ASS导出中只计算一次）
     max_width = int(width * 0.8)
-    lines_chinese = []
-    current_line_chinese = []
-    current_width_chinese = 0
-    for char in chinese_text:
-        char_width = font_chinese.getlength(char)
-        if current_width_chinese + char_width > max_width:
-            lines_chinese.append(''.join(current_line_chinese))
-            current_line_chinese = [char]
-            current_width_chinese = char_width
-        else:
-            current_line_chinese.append(char)
-            current_width_chinese += char_width
-    lines_chinese.append(''.join(current_line_chinese))
-    
+    wrapped_chinese = wrap_text(chinese_text, font_path_chinese, font_size_chinese, max_width)
+    lines_chinese = [line for line, _ in wrapped_chinese]
+
     # 计算中文文本总高度（考虑行间距）
     total_height_chinese = (len(lines_chinese) - 1) * actual_line_height_chinese + base_line_height_chinese
     # 计算文字位置（垂直居中）
     y_chinese = int((height - total_height_chinese) // chinese_text_posotion)
-    
+
     # 定义模糊区域（扩大范围）
+    padding = int(round(40 * scale))
     blur_area = (
         0,  # x起点
-        y_chinese - 40,  # y起点（上方留出空间）
+        y_chinese - padding,  # y起点（上方留出空间）
         width,  # x终点（整个宽度）
-        y_chinese + total_height_chinese + 40  # y终点（下方留出空间）
+        y_chinese + total_height_chinese + padding  # y终点（下方留出空间）
     )
-    
-    # 裁剪区域并进行多次模糊
-    cropped = pil_img.crop(blur_area)
-    for _ in range(5):  # 增加模糊次数
-        cropped = cropped.filter(ImageFilter.GaussianBlur(radius=15))
-    
-    # 将模糊后的区域粘贴回原图
-    pil_img.paste(cropped, blur_area)
-    
-    # 重新创建draw对象
-    draw = ImageDraw.Draw(pil_img)
-    
-    # 绘制文字（带阴影）
-    shadow_color = (0, 0, 0, 150)  # 阴影颜色
-    
-    for line in lines_chinese:
-        line_width_chinese = font_chinese.getlength(line)
+
+    # 每行水平居中
+    placements = []
+    for line, line_width_chinese in wrapped_chinese:
         x_chinese = int((width - line_width_chinese) // 2)
-        # 绘制阴影
-        draw.text((x_chinese+2, y_chinese+2), line, font=font_chinese, fill=shadow_color)
-        # 绘制主文字
-        draw.text((x_chinese, y_chinese), line, font=font_chinese, fill=chinese_text_color)
+        placements.append((line, x_chinese, y_chinese))
         y_chinese += actual_line_height_chinese
-    
-    return cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
 
+    return font_chinese, placements, blur_area
+
+def build_subtitle_overlay(
+    width,
+    height,
+    chinese_text,
+    font_path_chinese,
+    chinese_text_size=10,
+    chinese_text_color=(0,0,0),
+    chinese_text_posotion=1.75,
+    line_spacing=1.5,
+    scale=1.0,
+    ):
+    """
+    预先计算字幕的排版并绘制文字图层，每句字幕只需调用一次
+
+    参数:
+        width, height: 目标帧尺寸
+        scale: 同 layout_subtitle，阴影偏移也按比例缩放
+        其余参数同 create_static_text_image
+    返回:
+        SubtitleOverlay
+    """
+    font_chinese, placements, blur_area = layout_subtitle(
+        width,
+        height,
+        chinese_text,
+        font_path_chinese,
+        chinese_text_size,
+        chinese_text_posotion,
+        line_spacing,
+        scale
+    )
+
+    # 用字形集合拼出横条区域的文字遮罩，坐标相对于横条左上角；
+    # 阴影是文字向右下偏移2像素（按scale缩放），遮罩四周多留同样的像素，阴影直接取同一遮罩的偏移视图
+    offset = max(1, int(round(2 * scale)))
+    roi_x0, roi_y0, roi_x1, roi_y1 = _clamp_area(blur_area, width, height)
+    roi_width, roi_height = max(0, roi_x1 - roi_x0), max(0, roi_y1 - roi_y0)
+    atlas = get_glyph_atlas(font_path_chinese, font_chinese.size)
+    canvas = np.zeros((roi_height + offset, roi_width + offset), dtype=np.uint8)
+    for line, x_chinese, y_chinese in placements:
+        atlas.render_line(canvas, line, x_chinese - roi_x0 + offset, y_chinese - roi_y0 + offset)
+    text_mask = canvas[offset:, offset:]
+    shadow_mask = canvas[:-offset, :-offset]
+
+    # 合成RGBA图层：原实现在RGB图上先画黑色阴影再画文字，阴影的透明度并不生效，
+    # 因此这里按 结果 = 背景*(1-阴影)*(1-文字) + 文字颜色*文字 折算出等效的颜色和透明度
+    s = shadow_mask.astype(np.float32) / 255
+    t = text_mask.astype(np.float32) / 255
+    alpha = 1 - (1 - s) * (1 - t)
+    color = np.array(chinese_text_color[:3], dtype=np.float32)
+    rgb = color * (t / np.maximum(alpha, 1e-6))[..., None]
+    rgba = np.dstack([rgb, alpha * 255])
+    layer = Image.fromarray(np.clip(rgba + 0.5, 0, 255).astype(np.uint8), 'RGBA')
+
+    return SubtitleOverlay(width, height, layer, blur_area, [line for line, _, _ in placements])
+
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def _cached_subtitle_overlay(width, height, chinese_text, font_path_chinese, chinese_text_size,
+                             chinese_text_color, chinese_text_posotion, line_spacing, scale):
+    return build_subtitle_overlay(width, height, chinese_text, font_path_chinese, chinese_text_size,
+                                  chinese_text_color, chinese_text_posotion, line_spacing, scale)
+
+def get_subtitle_overlay(
+    width,
+    height,
+    chinese_text,
+    font_path_chinese,
+    chinese_text_size=10,
+    chinese_text_color=(0,0,0),
+    chinese_text_posotion=1.75,
+    line_spacing=1.5,
+    scale=1.0,
+    ):
+    """
+    同 build_subtitle_overlay，但相同的字幕和样式在进程内只渲染一次（重复出现的句子、
+    同一句拆成的多个片段共用一个图层）。图层的中间缓冲区按线程分开，可以在多个线程中同时使用。
+    """
+    return _cached_subtitle_overlay(width, height, chinese_text, font_path_chinese, chinese_text_size,
+                                    tuple(chinese_text_color), chinese_text_posotion, line_spacing, scale)
+
+def _clamp_area(area, width, height):
+    """将区域限制在帧范围内"""
+    x0, y0, x1, y1 = area
+    return max(0, x0), max(0, y0), min(width, x1), min(height, y1)
+
+def blend_subtitle_layer(band, overlay):
+    """
+    把文字图层按透明度混合到已模糊的BGR横条上（原地修改）
+
+    结果 = (背景*(255-α) + 前景*α + 127) // 255，全部写入预分配的缓冲区
+    """
+    buf = overlay.scratch()
+    np.multiply(band, overlay.inv_alpha, out=buf)
+    buf += overlay.premultiplied
+    buf //= 255
+    np.copyto(band, buf, casting='unsafe')
+    return band
+
+def _composite_numpy(band, overlay, blur_mode):
+    """直接在BGR横条上原地模糊并混合文字图层，不做颜色空间转换"""
+    band[...] = blur_band(band, blur_mode)
+    blend_subtitle_layer(band, overlay)
+
+def _composite_pil(band, overlay, blur_mode):
+    """将横条转换为PIL图像后模糊并粘贴文字图层，再写回横条"""
+    pil_img = Image.fromarray(cv2.cvtColor(band, cv2.COLOR_BGR2RGB))
+    pil_img = Image.fromarray(blur_band(np.asarray(pil_img), blur_mode))
+    # 叠加文字图层（带阴影）
+    pil_img.paste(overlay.layer, (0, 0), overlay.layer)
+    band[...] = cv2.cvtColor(np.asarray(pil_img), cv2.COLOR_RGB2BGR)
+
+def apply_subtitle_overlay(frame, overlay, blur_mode='quality', compose_mode='numpy'):
+    """
+    将预渲染的字幕叠加到帧上（模糊横条 + 文字图层）
+
+    只处理字幕横条所在的行：从帧中切出横条视图，处理后原地写回，
+    因此每帧耗时只与横条高度有关，与整帧分辨率无关。
+
+    参数:
+        frame: 输入的帧（BGR numpy数组），尺寸需与overlay一致，会被原地修改
+        overlay: build_subtitle_overlay 的返回值
+        blur_mode: 模糊模式，见 blur_band
+        compose_mode: 'numpy' 直接在BGR数据上合成；'pil' 经PIL合成
+    返回:
+        修改后的frame
+    """
+    if compose_mode not in ('numpy', 'pil'):
+        raise ValueError(f"不支持的合成模式: {compose_mode}")
+    x0, y0, x1, y1 = overlay.roi
+    if x1 <= x0 or y1 <= y0:
+        return frame
+
+    band = frame[y0:y1, x0:x1]
+    if compose_mode == 'numpy':
+        _composite_numpy(band, overlay, blur_mode)
+    else:
+        _composite_pil(band, overlay, blur_mode)
+    return frame
+
+def apply_subtitle_overlay_batch(frames, overlay, blur_mode='quality', compose_mode='numpy'):
+    """
+    将预渲染的字幕叠加到一批帧上
+
+    模糊仍逐帧进行（相邻帧的横条不能互相模糊），文字图层的混合对整批横条
+    做一次numpy运算，减少逐帧的Python调用开销。
+
+    参数:
+        frames: (N, 高, 宽, 3) 的BGR帧数组，会被原地修改
+        overlay, blur_mode, compose_mode: 同 apply_subtitle_overlay
+    返回:
+        修改后的frames
+    """
+    if compose_mode != 'numpy':
+        for frame in frames:
+            apply_subtitle_overlay(frame, overlay, blur_mode, compose_mode)
+        return frames
+    x0, y0, x1, y1 = overlay.roi
+    if x1 <= x0 or y1 <= y0 or len(frames) == 0:
+        return frames
+
+    bands = frames[:, y0:y1, x0:x1]
+    for band in bands:
+        band[...] = blur_band(band, blur_mode)
+
+    buf = overlay.batch_scratch(len(frames))
+    np.multiply(bands, overlay.inv_alpha, out=buf)
+    buf += overlay.premultiplied
+    buf //= 255
+    np.copyto(bands, buf, casting='unsafe')
+    return frames
+
+def create_static_text_image(
+    frame,
+    chinese_text,
+    font_path_chinese,
+    chinese_text_size=10,
+    chinese_text_color=(0,0,0),
+    chinese_text_posotion=1.75,
+    line_spacing=1.5,
+    blur_mode='quality',
+    ):
+    """
+    直接在帧上添加文字和模糊背景
+
+    参数:
+        frame: 输入的帧（numpy数组）
+        chinese_text: 要添加的中文文字
+        font_path_chinese: 中文字体路径
+        chinese_text_size: 文字大小
+        chinese_text_color: 文字颜色
+        chinese_text_posotion: 文字位置
+        line_spacing: 行间距
+        blur_mode: 模糊模式，见 blur_band
+    """
+    height, width = frame.shape[:2]
+    overlay = build_subtitle_overlay(
+        width,
+        height,
+        chinese_text,
+        font_path_chinese,
+        chinese_text_size,
+        chinese_text_color,
+        chinese_text_posotion,
+        line_spacing
+    )
+    return apply_subtitle_overlay(frame, overlay, blur_mode)
@@ -0,0 +1,149 @@
+import time
+import logging
+from collections import OrderedDict
+import cv2
+from make_image import BLUR_SIGMA, get_subtitle_overlay, blend_subtitle_layer
+from frame_cache import is_still_image, read_still_frame
+
+logger = logging.getLogger(__name__)
+
+# 预估语音时长：腾讯云默认语速约每秒4~5个汉字，句尾保留约0.1秒静音
+CHARS_PER_SECOND = 4.5
+SENTENCE_GAP = 0.1
+# 缓存的缩略图数量上限（按帧号区分）
+THUMBNAIL_CACHE_SIZE = 32
+
+def estimate_timeline(sentences, chars_per_second=CHARS_PER_SECOND, gap=SENTENCE_GAP):
+    """
+    在合成语音之前按字数估计每句字幕的时间段，格式与 app.py 中的 tmls 相同
+
+    返回:
+        [[开始秒, 结束秒], ...]
+    """
+    tmls = []
+    current_time = 0
+    for sentence in sentences:
+        duration = len(sentence) / chars_per_second + gap
+        tmls.append([current_time, current_time + duration])
+        current_time += duration
+    return tmls
+
+def fit_scale(width, height, max_width, max_height):
+    """保持宽高比放入 max_width x max_height 时的缩放比例"""
+    return min(max_width / width, max_height / height)
+
+class PreviewEngine:
+    """
+    低分辨率即时预览
+
+    背景帧解码一次后缩小保存为缩略图；修改字幕样式时直接按预览尺寸排版和栅格化文字图层
+    （字形集合和换行都有缓存），模糊和混合只处理缩略图上的横条，整帧不必按原分辨率合成。
+    切换到其它句子时按该句的时间点取背景帧，取过的帧直接使用缓存的缩略图。
+    """
+    def __init__(self, background_path, max_width, max_height):
+        """
+        参数:
+            background_path: 背景视频或图片路径
+            max_width, max_height: 预览图的最大尺寸
+        """
+        self.background_path = background_path
+        self._thumbnails = OrderedDict()
+        self._cap = None
+
+        if is_still_image(background_path):
+            frame, self.fps = read_still_frame(background_path)
+            self.frame_count = 1
+            self.height, self.width = frame.shape[:2]
+        else:
+            self._cap = cv2.VideoCapture(background_path)
+            if not self._cap.isOpened():
+                raise FileNotFoundError(f"无法打开视频文件 {background_path}")
+            self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 25
+            self.frame_count = max(1, int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+            # 首帧顺序读取即可，不需要定位
+            ret, frame = self._cap.read()
+            if not ret:
+                raise ValueError("无法读取视频文件")
+
+        self.scale = fit_scale(self.width, self.height, max_width, max_height)
+        self.preview_size = (max(1, int(self.width * self.scale)), max(1, int(self.height * self.scale)))
+        self._thumbnails[0] = self._downscale(frame)
+
+    def _downscale(self, frame):
+        interpolation = cv2.INTER_AREA if self.scale < 1 else cv2.INTER_LINEAR
+        return cv2.resize(frame, self.preview_size, interpolation=interpolation)
+
+    def thumbnail(self, seconds=0):
+        """
+        背景在 seconds 秒处（超出背景长度时循环）的缩略图，返回只读的缓存帧
+
+        参数:
+            seconds: 时间点（秒）
+        """
+        index = int(round(seconds * self.fps)) % self.frame_count if self._cap else 0
+        cached = self._thumbnails.get(index)
+        if cached is not None:
+            self._thumbnails.move_to_end(index)
+            return cached
+
+        # 预览只取单帧，直接使用OpenCV的定位；不在界面线程上扫描整个视频生成关键帧索引
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = self._cap.read()
+        if not ret:
+            raise ValueError(f"无法读取视频第 {index} 帧")
+        thumb = self._downscale(frame)
+        self._thumbnails[index] = thumb
+        if len(self._thumbnails) > THUMBNAIL_CACHE_SIZE:
+            self._thumbnails.popitem(last=False)
+        return thumb
+
+    def render(
+        self,
+        chinese_text,
+        font_path_chinese,
+        chinese_text_size=10,
+        chinese_text_color=(0,0,0),
+        chinese_text_posotion=1.75,
+        line_spacing=1.5,
+        seconds=0,
+        ):
+        """
+        合成预览图
+
+        参数:
+            seconds: 背景取帧的时间点（秒）
+            其余参数同 make_image.create_static_text_image
+        返回:
+            (BGR预览图, 耗时毫秒)
+        """
+        start = time.perf_counter()
+        image = self.thumbnail(seconds).copy()
+        # 直接按预览尺寸排版和栅格化（字号由预览尺寸算出，留白和阴影按比例缩放），不生成原尺寸的图层
+        preview_width, preview_height = self.preview_size
+        overlay = get_subtitle_overlay(
+            preview_width,
+            preview_height,
+            chinese_text,
+            font_path_chinese,
+            chinese_text_size,
+            chinese_text_color,
+            chinese_text_posotion,
+            line_spacing,
+            self.scale
+        )
+        x0, y0, x1, y1 = overlay.roi
+        if x1 > x0 and y1 > y0:
+            band = image[y0:y1, x0:x1]
+            # 模糊半径随缩放比例缩小，效果与原尺寸模糊后再缩小一致
+            band[...] = cv2.GaussianBlur(band, (0, 0), max(BLUR_SIGMA * self.scale, 0.5), borderType=cv2.BORDER_REFLECT)
+            blend_subtitle_layer(band, overlay)
+        return image, (time.perf_counter() - start) * 1000
+
+    def close(self):
+        """释放视频文件和缓存的缩略图"""
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        self._thumbnails.clear()
@@ -0,0 +1,96 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 跨任务复用的视频片段缓存目录
+SEGMENT_CACHE_DIR = './segment_cache'
+# 片段缓存的默认大小上限（字节），超过后删除最久未使用的片段
+DEFAULT_SEGMENT_CACHE_BYTES = 2 * 1024 ** 3
+
+# 不影响片段内容的参数，不参与缓存键计算
+_IGNORED_KEYS = {
+    'input_video_path',
+    'output_video_path',
+    'start_time',
+    'end_time',
+    'frame_cache_path',
+    'keyframe_index',
+    'pipeline_workers',
+    'batch_memory',
+    'still_image',
+    'segment_cache_dir',
+    'segment_key',
+}
+
+def segment_key(conf, background_digest, start_frame, frame_count, still_image=False):
+    """
+    计算片段的内容键
+
+    参数:
+        conf: 传给 get_video.create_video 的参数（字幕、样式、编码参数等）
+        background_digest: 背景文件的 background_ingest.file_digest
+        start_frame: 片段在背景中的开始帧（已按背景长度取模）
+        frame_count: 片段帧数
+        still_image: 静态背景与开始位置无关，只按帧数区分
+    """
+    source = {key: value for key, value in conf.items() if key not in _IGNORED_KEYS}
+    source['background'] = background_digest
+    source['window'] = [0 if still_image else start_frame, frame_count]
+    text = json.dumps(source, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def _cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f'{key}.mp4')
+
+def has_segment(cache_dir, key):
+    """缓存中是否已有该片段"""
+    return os.path.exists(_cache_path(cache_dir, key))
+
+def fetch_segment(cache_dir, key, output_path):
+    """缓存命中时把片段复制到 output_path 并返回True"""
+    cached = _cache_path(cache_dir, key)
+    if not os.path.exists(cached):
+        return False
+    shutil.copyfile(cached, output_path)
+    # 更新修改时间，清理时按最近使用排序
+    os.utime(cached)
+    logger.info(f"复用已渲染的片段: {key}")
+    return True
+
+def store_segment(cache_dir, key, output_path):
+    """把渲染好的片段保存到缓存（先写临时文件再改名，避免其它任务读到不完整的文件）"""
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = _cache_path(cache_dir, key)
+    # 临时文件名按进程和线程区分，并发任务保存同一片段时不会写入同一个文件
+    tmp_path = f'{cached}.{os.getpid()}.{threading.get_ident()}.tmp'
+    shutil.copyfile(output_path, tmp_path)
+    os.replace(tmp_path, cached)
+
+def prune_segment_cache(cache_dir, max_bytes=DEFAULT_SEGMENT_CACHE_BYTES):
+    """缓存超过 max_bytes 时按最近使用时间删除最旧的片段"""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.mp4'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError as e:
+            logger.warning(f"删除片段缓存失败: {path} {str(e)}")
@@ -0,0 +1,116 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 跨任务复用的语音缓存目录
+TTS_CACHE_DIR = './tts_cache'
+# 语音缓存的默认大小上限（字节），超过后删除最久未使用的语音
+DEFAULT_TTS_CACHE_BYTES = 512 * 1024 ** 2
+
+# 命中统计（进程内累计）
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+def tts_key(provider, text, voice=None, speed=None, volume=None):
+    """
+    计算语音的内容键
+
+    参数:
+        provider: 语音服务名
+        text: 送去合成的文本（已替换禁用词）
+        voice, speed, volume: 音色、语速、音量，不同参数的语音互不复用
+    """
+    # 语速、音量统一为浮点数，0 和 0.0 视为同一参数
+    speed = None if speed is None else float(speed)
+    volume = None if volume is None else float(volume)
+    source = json.dumps([provider, voice, speed, volume, text], ensure_ascii=False)
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+# 缓存的语音格式（按输出文件扩展名区分，MP3与WAV互不复用）
+CLIP_EXTENSIONS = ('.mp3', '.wav')
+
+def _paths(cache_dir, key, output_path):
+    clip_path = os.path.join(cache_dir, key + os.path.splitext(output_path)[1].lower())
+    return clip_path, f'{clip_path}.json'
+
+def fetch_tts(cache_dir, key, output_path):
+    """
+    缓存命中时把已处理好的语音复制到 output_path
+
+    返回:
+        语音时长（秒）；未命中或 cache_dir 为None时返回None
+    """
+    if not cache_dir:
+        return None
+    clip_path, meta_path = _paths(cache_dir, key, output_path)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            duration = json.load(f)['duration']
+        shutil.copyfile(clip_path, output_path)
+    except (OSError, ValueError, KeyError):
+        with _stats_lock:
+            _stats['misses'] += 1
+        return None
+    # 更新修改时间，清理时按最近使用排序
+    os.utime(clip_path)
+    with _stats_lock:
+        _stats['hits'] += 1
+    logger.info(f"复用已合成的语音: {key}")
+    return duration
+
+def store_tts(cache_dir, key, output_path, duration):
+    """把处理好的语音和时长存入缓存，合成失败（时长为0或文件不存在）时不保存"""
+    if not cache_dir or not duration or not os.path.exists(output_path):
+        return
+    clip_path, meta_path = _paths(cache_dir, key, output_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 先写语音再写描述文件，描述文件存在即表示缓存完整；临时文件名按线程区分，避免并发任务互相覆盖
+        suffix = f'{os.getpid()}.{threading.get_ident()}.tmp'
+        shutil.copyfile(output_path, f'{clip_path}.{suffix}')
+        os.replace(f'{clip_path}.{suffix}', clip_path)
+        with open(f'{meta_path}.{suffix}', 'w', encoding='utf-8') as f:
+            json.dump({'duration': duration}, f)
+        os.replace(f'{meta_path}.{suffix}', meta_path)
+    except OSError as e:
+        logger.warning(f"保存语音缓存失败: {str(e)}")
+
+def prune_tts_cache(cache_dir=TTS_CACHE_DIR, max_bytes=DEFAULT_TTS_CACHE_BYTES):
+    """缓存超过 max_bytes 时按最近使用时间删除最旧的语音"""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(CLIP_EXTENSIONS):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            # 先删描述文件，其它任务不会再读到这条缓存
+            meta_path = f'{path}.json'
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            os.remove(path)
+            total -= size
+        except OSError as e:
+            logger.warning(f"删除语音缓存失败: {path} {str(e)}")
+
+def tts_cache_stats():
+    """语音缓存的命中统计"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0}
@@ -0,0 +1,105 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# 各语音服务允许的同时请求数（所有任务共用），超过服务端QPS限制会被拒绝
+DEFAULT_TTS_CONCURRENCY = {
+    'tencent': 4,
+    'azure': 4,
+    'edge': 4,
+    'ali': 2,
+}
+
+class ProviderLimiter:
+    """
+    可调整上限的并发限制，用法与信号量相同（with limiter: ...）
+
+    调整上限时不更换对象，所有任务始终共用同一个计数：调大后等待中的请求立即继续，
+    调小后已在进行的请求照常完成，新的请求等到进行中的数量低于新上限再开始。
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def resize(self, limit):
+        with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+    def __enter__(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+# 服务名 -> ProviderLimiter
+_provider_limits = {}
+_provider_limits_lock = threading.Lock()
+
+def provider_limit(provider, concurrency=None):
+    """
+    获取语音服务的并发限制，同一进程内的所有任务共用
+
+    参数:
+        provider: 服务名，见 DEFAULT_TTS_CONCURRENCY
+        concurrency: 并发数，None 时使用默认值；与当前值不同时调整共用限制的上限
+    返回:
+        (并发数, ProviderLimiter)
+    """
+    if concurrency is None:
+        concurrency = DEFAULT_TTS_CONCURRENCY.get(provider, 1)
+    concurrency = max(1, int(concurrency))
+    with _provider_limits_lock:
+        limiter = _provider_limits.get(provider)
+        if limiter is None:
+            limiter = _provider_limits[provider] = ProviderLimiter(concurrency)
+        elif limiter.limit != concurrency:
+            limiter.resize(concurrency)
+        return concurrency, limiter
+
+def synthesize_all(jobs, synthesize, provider='tencent', concurrency=None, progress_callback=None):
+    """
+    并发合成多句语音，结果按 jobs 的原顺序返回
+
+    参数:
+        jobs: 每句的参数列表
+        synthesize: synthesize(job)，合成一句并返回结果，失败时抛出异常
+        provider: 服务名，决定使用哪个并发上限
+        concurrency: 覆盖该服务的默认并发数
+        progress_callback: 可选，每句完成后回调 progress_callback(序号, 结果)（在工作线程中调用）
+    返回:
+        与 jobs 等长的结果列表
+    """
+    if not jobs:
+        return []
+    limit, limiter = provider_limit(provider, concurrency)
+
+    def run(job):
+        # 多个任务同时合成时，共用的限制保证该服务的总请求数不超过上限
+        with limiter:
+            return synthesize(job)
+
+    results = [None] * len(jobs)
+    logger.info(f"并发合成 {len(jobs)} 句语音，{provider} 并发上限 {limit}")
+    with ThreadPoolExecutor(max_workers=min(limit, len(jobs))) as executor:
+        futures = {executor.submit(run, job): idx for idx, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception:
+                for pending in futures:
+                    pending.cancel()
+                raise
+            if progress_callback:
+                progress_callback(idx, results[idx])
+    return results
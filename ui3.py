@@ -14,6 +14,10 @@ import shutil
 import json
 from get_video import replace_prohibited_words
 from make_image import *
+from preview_engine import PreviewEngine, estimate_timeline
+
+# 预览在样式停止输入多少毫秒后刷新
+PREVIEW_DEBOUNCE_MS = 30
 
 class VideoGeneratorApp:
     def __init__(self, root):
@@ -46,7 +50,14 @@ class VideoGeneratorApp:
         # 存储已下载的抖音视频路径
         self.downloaded_douyin_video = None
         
+        # 实时预览
+        self.preview_engine = None
+        self.preview_window = None
+        self.preview_after_id = None
+        self.watch_preview_inputs()
+        
     def create_static_text_image2(self):
+        """打开实时预览窗口：修改字幕样式后自动刷新，拖动滑块切换到任意一句"""
         data = self.select_data()
         
         # 如果是抖音视频，使用已下载的视频
@@ -60,68 +71,110 @@ class VideoGeneratorApp:
             image_path = self.bg_image_var.get()
             
         ret = self.validate_all_inputs(data)
-        data['sentences'] = split_sentences(data['sentences'])
+        if ret != True:
+            messagebox.showinfo("输入格式验证失败", ret)
+            return
         
-        if ret == True:
-            chinese_text = data['sentences'][0]
-            chinese_text = replace_prohibited_words(chinese_text, self.prohibited_words_file)
-            font_path_chinese = './base/font/' + self.font_chinese_var.get()
-            chinese_text_size = int(self.chinese_size_var.get())
-            chinese_text_color = tuple(self.hex_to_rgb(self.chinese_color_var.get()))
-            chinese_text_posotion = float(self.chinese_pos_var.get())
-            line_spacing = float(self.line_spacing_var.get())
-            cap = cv2.VideoCapture(image_path)
-            if not cap.isOpened():
-                raise FileNotFoundError(f"无法打开视频文件 {image_path}")
-            ret, frame = cap.read()
-            if not ret:
-                raise ValueError("无法读取视频文件")
-            image = create_static_text_image(
-                frame,
-                chinese_text,
-                font_path_chinese,
-                chinese_text_size=chinese_text_size,
-                chinese_text_color=chinese_text_color,
-                chinese_text_posotion=chinese_text_posotion,
-                line_spacing=line_spacing,
-                )
-            pil_img = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-            
-            # 获取原始图片尺寸
-            original_width, original_height = pil_img.size
-            
-            # 获取屏幕尺寸
-            screen_width = self.root.winfo_screenwidth()
-            screen_height = self.root.winfo_screenheight()
-            
-            # 计算目标尺寸（屏幕的1/4）
-            target_width = screen_width // 2
-            target_height = screen_height // 2
-            
-            # 计算保持宽高比的缩放比例
-            width_ratio = target_width / original_width
-            height_ratio = target_height / original_height
-            scale_ratio = min(width_ratio, height_ratio)
-            
-            # 计算新的尺寸
-            new_width = int(original_width * scale_ratio)
-            new_height = int(original_height * scale_ratio)
-            
-            # 缩放图片
-            pil_img = pil_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 创建预览窗口，大小根据缩放后的图片尺寸调整
-            preview_window = Toplevel(self.root)
-            preview_window.geometry(f"{new_width}x{new_height}")  # 添加一些边距
-            preview_window.title("第一帧预览")
-            
-            # 将生成的图像转换为Tkinter可显示格式
-            img_tk = ImageTk.PhotoImage(pil_img)
-            preview_label = Label(preview_window, image=img_tk)
-            preview_label.image = img_tk  # 保存引用
-            preview_label.pack()
+        # 背景缩略图只解码一次，更换背景后重新建立
+        if self.preview_engine is None or self.preview_engine.background_path != image_path:
+            self.close_preview_engine()
+            # 预览图最大为屏幕的1/2
+            self.preview_engine = PreviewEngine(
+                image_path,
+                self.root.winfo_screenwidth() // 2,
+                self.root.winfo_screenheight() // 2
+            )
+        
+        if self.preview_window is None or not self.preview_window.winfo_exists():
+            # 创建预览窗口，大小随预览图调整
+            self.preview_window = Toplevel(self.root)
+            self.preview_window.title("字幕预览")
+            self.preview_window.protocol("WM_DELETE_WINDOW", self.close_preview_window)
+            self.preview_label = Label(self.preview_window)
+            self.preview_label.pack()
+            # 按句子序号拖动，背景取该句预计出现时的画面
+            self.preview_sentence_var = tk.IntVar(value=1)
+            self.preview_scale = tk.Scale(
+                self.preview_window,
+                from_=1,
+                to=1,
+                orient="horizontal",
+                label="句子",
+                variable=self.preview_sentence_var,
+                command=lambda _: self.schedule_preview_update()
+            )
+            self.preview_scale.pack(fill="x")
         else:
-            messagebox.showinfo("输入格式验证失败", ret)
+            self.preview_window.lift()
+        self.update_preview()
+    
+    def watch_preview_inputs(self):
+        """字体和文本样式变化时刷新预览"""
+        for var in (self.font_chinese_var, self.chinese_size_var, self.chinese_color_var, self.chinese_pos_var, self.line_spacing_var):
+            var.trace_add("write", lambda *args: self.schedule_preview_update())
+    
+    def schedule_preview_update(self):
+        """连续输入时只在停顿 PREVIEW_DEBOUNCE_MS 毫秒后刷新一次"""
+        if self.preview_window is None:
+            return
+        if self.preview_after_id is not None:
+            self.root.after_cancel(self.preview_after_id)
+        self.preview_after_id = self.root.after(PREVIEW_DEBOUNCE_MS, self.update_preview)
+    
+    def update_preview(self):
+        """按当前样式重新合成预览图"""
+        self.preview_after_id = None
+        if self.preview_window is None or not self.preview_window.winfo_exists():
+            return
+        data = self.select_data()
+        # 输入到一半（如颜色只填了几位）时保持上一次的预览
+        for key in ('chinese_text_size', 'chinese_text_position', 'line_spacing'):
+            if not validate_input(data[key], 'number') or float(data[key]) <= 0:
+                return
+        if not validate_input(data['chinese_text_color'], 'hex_color') or not validate_input(data['font_path_chinese'], 'file_path'):
+            return
+        sentences = split_sentences(data['sentences'])
+        if not sentences:
+            return
+        
+        self.preview_scale.config(to=len(sentences))
+        index = min(self.preview_sentence_var.get(), len(sentences)) - 1
+        start_time = estimate_timeline(sentences)[index][0]
+        chinese_text = replace_prohibited_words(sentences[index], self.prohibited_words_file)
+        try:
+            image, elapsed = self.preview_engine.render(
+                chinese_text,
+                data['font_path_chinese'],
+                chinese_text_size=int(float(data['chinese_text_size'])),
+                chinese_text_color=tuple(self.hex_to_rgb(data['chinese_text_color'])),
+                chinese_text_posotion=float(data['chinese_text_position']),
+                line_spacing=float(data['line_spacing']),
+                seconds=start_time
+            )
+        except Exception as e:
+            print(f"预览失败: {e}")
+            return
+        
+        # 将生成的图像转换为Tkinter可显示格式
+        img_tk = ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+        self.preview_label.config(image=img_tk)
+        self.preview_label.image = img_tk  # 保存引用
+        self.preview_window.title(f"字幕预览 - 第{index + 1}/{len(sentences)}句 {start_time:.1f}秒 ({elapsed:.0f}ms)")
+    
+    def close_preview_window(self):
+        """关闭预览窗口并释放背景视频"""
+        if self.preview_after_id is not None:
+            self.root.after_cancel(self.preview_after_id)
+            self.preview_after_id = None
+        if self.preview_window is not None:
+            self.preview_window.destroy()
+            self.preview_window = None
+        self.close_preview_engine()
+    
+    def close_preview_engine(self):
+        if self.preview_engine is not None:
+            self.preview_engine.close()
+            self.preview_engine = None
             
     def contains_chinese_characters(self,font_path):
         """检查字体文件是否包含中文字符"""
@@ -199,7 +252,7 @@ class VideoGeneratorApp:
         bottom_frame.pack(side="bottom", fill="x", pady=10)
         
         # 预览按钮
-        self.preview_btn = Button(bottom_frame, text="预览第一帧", command=self.create_static_text_image2)
+        self.preview_btn = Button(bottom_frame, text="预览字幕", command=self.create_static_text_image2)
         self.preview_btn.pack(side="left", padx=20)
         
         # 生成按钮
@@ -0,0 +1,130 @@
+import tempfile
+import subprocess
+import logging
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# 配置subprocess启动信息以隐藏窗口
+startupinfo = subprocess.STARTUPINFO()
+startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+# ffmpeg编码的默认参数
+DEFAULT_ENCODER_OPTIONS = {
+    'codec': 'libx264',     # 视频编码器
+    'preset': 'veryfast',   # 编码速度预设（仅x264/x265等编码器有效，设为None则不传）
+    'crf': 20,              # 质量系数，越小质量越高（设为None则不传）
+    'threads': 0,           # 编码线程数，0表示由ffmpeg自动决定
+    'buffer_frames': 4,     # 写入管道的缓冲区大小（帧数），缓冲区满时写入会阻塞
+}
+
+# yuv420p要求宽、高都是偶数，奇数尺寸的画面在右侧、底部各补一像素（cv2的mp4v没有这个限制）
+EVEN_SIZE_FILTER = 'pad=ceil(iw/2)*2:ceil(ih/2)*2'
+
+def ffmpeg_encoder_args(encoder_options=None, pad_even=True):
+    """
+    根据编码参数生成ffmpeg的视频编码命令行参数
+
+    参数:
+        pad_even: 为True时附带 -vf EVEN_SIZE_FILTER；已使用 -vf 或 -filter_complex 的命令
+                  不能再加 -vf，应传False并把 EVEN_SIZE_FILTER 接到自己的滤镜末尾
+    """
+    options = dict(DEFAULT_ENCODER_OPTIONS)
+    options.update(encoder_options or {})
+    args = ['-vf', EVEN_SIZE_FILTER] if pad_even else []
+    args += ['-c:v', options['codec']]
+    if options['preset'] is not None:
+        args += ['-preset', str(options['preset'])]
+    if options['crf'] is not None:
+        args += ['-crf', str(options['crf'])]
+    args += ['-threads', str(options['threads']), '-pix_fmt', 'yuv420p']
+    return args
+
+class FFmpegPipeWriter:
+    """
+    通过标准输入把原始BGR帧送给ffmpeg编码
+
+    接口与 cv2.VideoWriter 保持一致（write / release / isOpened），
+    帧只在ffmpeg中压缩一次，不产生中间文件。
+    """
+    def __init__(self, ffmpeg_path, output_path, fps, size, codec='libx264', preset='veryfast', crf=20, threads=0, buffer_frames=4):
+        width, height = size
+        self.output_path = output_path
+        self.frame_bytes = width * height * 3
+        cmd = [
+            ffmpeg_path,
+            '-y',
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            '-s', f'{width}x{height}',
+            '-r', str(fps),
+            '-i', '-',
+            '-an',
+        ]
+        cmd += ffmpeg_encoder_args({'codec': codec, 'preset': preset, 'crf': crf, 'threads': threads})
+        cmd.append(output_path)
+        # stderr写入临时文件，编码过程中输出较多时不会因管道写满而阻塞ffmpeg
+        self.stderr_file = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self.stderr_file,
+            bufsize=self.frame_bytes * max(1, buffer_frames),
+            startupinfo=startupinfo
+        )
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def write(self, frame):
+        """写入一帧（BGR numpy数组）"""
+        if frame.nbytes != self.frame_bytes:
+            raise ValueError(f"帧尺寸与编码器不一致: {frame.shape}")
+        try:
+            # 连续内存的帧直接写入，不额外复制
+            self.process.stdin.write(frame.data if frame.flags['C_CONTIGUOUS'] else frame.tobytes())
+        except (BrokenPipeError, OSError):
+            self.release()
+            raise
+
+    def release(self):
+        """结束写入并等待ffmpeg完成编码"""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        returncode = process.wait()
+        with self.stderr_file:
+            if returncode != 0:
+                self.stderr_file.seek(0)
+                message = self.stderr_file.read().decode('utf-8', errors='ignore').strip()
+                raise RuntimeError(f"ffmpeg编码失败: {self.output_path} {message}")
+
+def open_video_writer(output_path, fps, size, encoder='cv2', ffmpeg_path=None, encoder_options=None):
+    """
+    创建视频写入器
+
+    参数:
+        output_path: 输出文件路径
+        fps: 帧率
+        size: (宽, 高)
+        encoder: 'cv2' 使用 cv2.VideoWriter(mp4v)；'ffmpeg' 通过管道交给ffmpeg编码
+        ffmpeg_path: ffmpeg可执行文件路径（encoder为'ffmpeg'时必填）
+        encoder_options: 覆盖 DEFAULT_ENCODER_OPTIONS 中的参数
+    """
+    if encoder == 'cv2':
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        return cv2.VideoWriter(output_path, fourcc, fps, size)
+    if encoder == 'ffmpeg':
+        if not ffmpeg_path:
+            raise ValueError("使用ffmpeg编码时必须提供ffmpeg_path")
+        options = dict(DEFAULT_ENCODER_OPTIONS)
+        options.update(encoder_options or {})
+        return FFmpegPipeWriter(ffmpeg_path, output_path, fps, size, **options)
+    raise ValueError(f"不支持的编码方式: {encoder}")